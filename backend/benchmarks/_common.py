@@ -0,0 +1,19 @@
+"""
+Helpers shared by the benchmark scripts: synthetic drug-like words and
+latency percentiles.
+"""
+
+SYLLABLES = ["am", "ox", "cil", "lin", "met", "for", "min", "pra", "zol", "ator", "va", "sta", "tin", "lis", "no", "pril"]
+
+
+def fake_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud API Load Benchmark
+Seeds a scratch database with generate_data tenants, starts server.py under uvicorn
+against it and drives a weighted mix of login, create_sale, medicine search,
+prescriptions and dashboard requests at a fixed concurrency. Throughput and
+p50/p95/p99 per route are written as JSON so runs can be compared over time.
+Requires a local mongod (MONGO_URL).
+
+    python benchmarks/api_load.py --concurrency 64 --duration 60
+    python benchmarks/api_load.py --mix login=0,search_medicines=1 --output results/search.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+os.environ.setdefault("DB_NAME", "pharmacloud_loadtest")
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+from server import UserRole, create_indexes, db, get_password_hash  # noqa: E402
+from _common import percentile  # noqa: E402
+from generate_data import build_tenant_documents  # noqa: E402
+
+BENCH_PASSWORD = "bench-password"
+DEFAULT_MIX = "login=5,create_sale=30,search_medicines=35,get_prescriptions=15,dashboard=15"
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {route!r}; choose from {', '.join(ROUTES)}")
+        mix[route] = float(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("at least one route needs a positive weight")
+    return mix
+
+
+# Seeding
+async def seed(scale, seed_value, as_of):
+    """Insert generate_data tenants; returns one fixture per store for the workers"""
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    fixtures = []
+    for index in range(scale["tenants"]):
+        documents = build_tenant_documents(index, scale, seed_value, as_of, hashed_password)
+        for collection, docs in documents.items():
+            await db[collection].insert_many(docs, ordered=False)
+
+        tenant = documents["tenants"][0]
+        manager = next(user for user in documents["users"] if user["role"] == UserRole.PHARMACY_MANAGER)
+        customer_ids = [doc["id"] for doc in documents.get("customers", [])]
+        # Pharmacists are scoped to one store each, so each works that store's stock
+        for pharmacist in (user for user in documents["users"] if user["role"] == UserRole.PHARMACIST):
+            store_id = pharmacist["store_ids"][0]
+            fixtures.append({
+                "subdomain": tenant["subdomain"],
+                "manager_email": manager["email"],
+                "pharmacist_email": pharmacist["email"],
+                "store_ids": [store_id],
+                "medicines": [
+                    (doc["store_id"], doc["id"], doc["name"], doc["selling_price"])
+                    for doc in documents["medicines"] if doc["store_id"] == store_id
+                ],
+                "customer_ids": customer_ids,
+            })
+    await create_indexes()
+    return fixtures
+
+
+# Server process
+def start_server(port, workers, mongo_url, db_name):
+    env = {**os.environ, "MONGO_URL": mongo_url, "DB_NAME": db_name}
+    env.setdefault("EXPIRY_SCHEDULER_ENABLED", "false")
+    command = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def wait_until_ready(process, root_url, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{root_url}/openapi.json", timeout=1).ok:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"server did not become ready within {timeout:.0f}s")
+
+
+# Routes
+class Worker:
+    """One simulated client: a session, a tenant and its tokens"""
+
+    def __init__(self, base_url, fixture, rng):
+        self.base_url = base_url
+        self.fixture = fixture
+        self.rng = rng
+        self.session = requests.Session()
+        self.stock = {}
+        for medicine in fixture["medicines"]:
+            self.stock.setdefault(medicine[0], []).append(medicine)
+        self.pharmacist = self.headers(self.login(fixture["pharmacist_email"]).json()["access_token"])
+        self.manager = self.headers(self.login(fixture["manager_email"]).json()["access_token"])
+
+    @staticmethod
+    def headers(token):
+        return {"Authorization": f"Bearer {token}"}
+
+    def login(self, email):
+        payload = {"email": email, "password": BENCH_PASSWORD, "subdomain": self.fixture["subdomain"]}
+        return self.session.post(f"{self.base_url}/auth/login", json=payload)
+
+    def route_login(self):
+        return self.login(self.rng.choice([self.fixture["pharmacist_email"], self.fixture["manager_email"]]))
+
+    def route_create_sale(self):
+        store_id = self.rng.choice(self.fixture["store_ids"])
+        stocked = self.stock[store_id]
+        items = [
+            {"medicine_id": medicine_id, "medicine_name": name, "quantity": self.rng.randint(1, 3), "price": price}
+            for _, medicine_id, name, price in self.rng.sample(stocked, min(len(stocked), self.rng.randint(1, 5)))
+        ]
+        customer_ids = self.fixture["customer_ids"]
+        sale = {
+            "customer_id": self.rng.choice(customer_ids) if customer_ids and self.rng.random() < 0.6 else None,
+            "items": items,
+            "amount_paid": sum(item["price"] * item["quantity"] for item in items) * 1.2,
+            "payment_method": self.rng.choice(["cash", "card"]),
+        }
+        return self.session.post(
+            f"{self.base_url}/sales", params={"store_id": store_id}, json=sale, headers=self.pharmacist
+        )
+
+    def route_search_medicines(self):
+        _, _, name, _ = self.rng.choice(self.fixture["medicines"])
+        params = {"search": name[: self.rng.randint(2, 5)], "limit": 50}
+        if self.rng.random() < 0.5:
+            params["store_id"] = self.rng.choice(self.fixture["store_ids"])
+        return self.session.get(f"{self.base_url}/medicines", params=params, headers=self.pharmacist)
+
+    def route_get_prescriptions(self):
+        params = {"store_id": self.rng.choice(self.fixture["store_ids"]), "limit": 50}
+        if self.rng.random() < 0.5:
+            params["status"] = "pending"
+        return self.session.get(f"{self.base_url}/prescriptions", params=params, headers=self.pharmacist)
+
+    def route_dashboard(self):
+        return self.session.get(f"{self.base_url}/dashboard/stats", headers=self.manager)
+
+
+ROUTES = {
+    "login": Worker.route_login,
+    "create_sale": Worker.route_create_sale,
+    "search_medicines": Worker.route_search_medicines,
+    "get_prescriptions": Worker.route_get_prescriptions,
+    "dashboard": Worker.route_dashboard,
+}
+
+
+def run_worker(worker, mix, measure_from, deadline, samples, lock):
+    routes, weights = zip(*[(route, weight) for route, weight in mix.items() if weight > 0])
+    local = []
+    while time.perf_counter() < deadline:
+        route = worker.rng.choices(routes, weights)[0]
+        started = time.perf_counter()
+        try:
+            ok = ROUTES[route](worker).ok
+        except requests.RequestException:
+            ok = False
+        finished = time.perf_counter()
+        if started >= measure_from:
+            local.append((route, (finished - started) * 1000, ok))
+    with lock:
+        samples.extend(local)
+
+
+def drive(base_url, fixtures, mix, concurrency, warmup, duration, seed_value):
+    workers = [
+        Worker(base_url, fixtures[i % len(fixtures)], random.Random(seed_value + i))
+        for i in range(concurrency)
+    ]
+    samples = []
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    threads = [
+        threading.Thread(target=run_worker, args=(worker, mix, measure_from, deadline, samples, lock))
+        for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    def stats(latencies, errors):
+        latencies = sorted(latencies)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / duration, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(statistics.mean(latencies), 2) if latencies else 0.0,
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        }
+
+    routes = {}
+    for route in ROUTES:
+        matching = [sample for sample in samples if sample[0] == route]
+        if matching:
+            routes[route] = stats([latency for _, latency, _ in matching], sum(1 for *_, ok in matching if not ok))
+    total = stats([latency for _, latency, _ in samples], sum(1 for *_, ok in samples if not ok))
+    return routes, total
+
+
+def run_with_database(mongo_url, db_name, make_coro):
+    """Run one coroutine on its own event loop and Mongo connection"""
+    server.mongo.connect(mongo_url, db_name)
+    try:
+        return asyncio.run(make_coro())
+    finally:
+        server.mongo.close()
+
+
+def main(args):
+    mongo_url = args.mongo_url or os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    process = None
+    try:
+        scale = {
+            "tenants": args.tenants, "min_stores": args.stores, "max_stores": args.stores,
+            "medicines": args.medicines, "customers": args.customers, "prescriptions": args.prescriptions,
+            "sales": args.sales, "years": 1,
+        }
+        as_of = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        print(f"Seeding {args.tenants} tenants into {args.db_name}...")
+        # A scratch database: generated subdomains and emails are the same on every run
+        run_with_database(mongo_url, args.db_name, lambda: server.mongo.client.drop_database(args.db_name))
+        fixtures = run_with_database(mongo_url, args.db_name, lambda: seed(scale, args.seed, as_of))
+
+        if args.base_url:
+            base_url = args.base_url.rstrip("/")
+        else:
+            process = start_server(args.port, args.workers, mongo_url, args.db_name)
+            base_url = f"http://127.0.0.1:{args.port}/api"
+        wait_until_ready(process, base_url.rsplit("/api", 1)[0])
+
+        print(f"Driving {args.concurrency} clients for {args.warmup:.0f}s warm-up + {args.duration:.0f}s...")
+        samples = drive(base_url, fixtures, args.mix, args.concurrency, args.warmup, args.duration, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if not args.keep_db:
+            run_with_database(mongo_url, args.db_name, lambda: server.mongo.client.drop_database(args.db_name))
+
+    routes, total = summarize(samples, args.duration)
+    result = {
+        "benchmark": "api_load",
+        "started_at": datetime.utcnow().isoformat(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "server_workers": None if args.base_url else args.workers,
+            "mix": args.mix,
+            "seed": args.seed,
+            "dataset": {
+                "tenants": args.tenants,
+                "stores_per_tenant": args.stores,
+                "medicines_per_store": args.medicines,
+                "customers_per_tenant": args.customers,
+                "prescriptions_per_tenant": args.prescriptions,
+                "sales_per_tenant": args.sales,
+            },
+        },
+        "routes": routes,
+        "total": total,
+    }
+
+    print(f"{'route':>18} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, row in [*routes.items(), ("total", total)]:
+        print(
+            f"{route:>18} {row['requests']:>7} {row['errors']:>5} {row['throughput_rps']:>8.1f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+        )
+
+    output = Path(args.output or Path(__file__).parent / "results" / f"api_load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Defaults to MONGO_URL")
+    parser.add_argument("--db-name", default=os.environ["DB_NAME"], help="Scratch database, dropped afterwards")
+    parser.add_argument("--keep-db", action="store_true", help="Keep the scratch database afterwards")
+    parser.add_argument("--base-url", help="Use an already running server on --db-name instead of starting one")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"Route weights (default {DEFAULT_MIX})")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--stores", type=int, default=2, help="Stores per tenant")
+    parser.add_argument("--medicines", type=int, default=2000, help="Medicines per store")
+    parser.add_argument("--customers", type=int, default=1000, help="Customers per tenant")
+    parser.add_argument("--prescriptions", type=int, default=2000, help="Prescriptions per tenant")
+    parser.add_argument("--sales", type=int, default=5000, help="Historical sales per tenant")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/api_load-<timestamp>.json)")
+    main(parser.parse_args())
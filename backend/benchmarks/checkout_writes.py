@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Checkout Write Benchmark
+Compares per-item update_one calls against the single bulk_write used by create_sale
+for 1-, 10- and 50-item baskets. Requires a local mongod (MONGO_URL).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "pharmacloud_bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+from server import (  # noqa: E402
+    PaymentMethod,
+    SaleCreate,
+    build_sale,
+    create_indexes,
+    db,
+    record_sale_writes,
+    sales_rollup_ops,
+    stock_adjustment_update,
+    version_keys,
+)
+from _common import percentile  # noqa: E402
+
+# Everything record_sale_writes touches, keyed by tenant_id
+TENANT_COLLECTIONS = ("medicines", "customers", "sales", "sales_daily_rollups", "sales_daily_medicine_rollups")
+
+
+async def seed_medicines(count):
+    tenant_id = str(uuid.uuid4())
+    store_id = str(uuid.uuid4())
+    medicines = [
+        {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "store_id": store_id,
+            "name": f"Bench Medicine {i}",
+            "generic_name": f"benchamine-{i}",
+            "quantity_in_stock": 1_000_000,
+            "min_stock_level": 10,
+            "selling_price": 9.99,
+            "expiry_date": datetime.utcnow() + timedelta(days=365),
+        }
+        for i in range(count)
+    ]
+    await db.medicines.insert_many(medicines)
+    await create_indexes()
+    return tenant_id, store_id, medicines
+
+
+def basket_sale(tenant_id, store_id, medicines, basket_size, customer_id):
+    """A cash sale of one each of the first `basket_size` medicines, priced by server.build_sale"""
+    items = [
+        {"medicine_id": med["id"], "medicine_name": med["name"], "quantity": 1, "price": med["selling_price"]}
+        for med in medicines[:basket_size]
+    ]
+    # Overpay so the cash always covers the total; build_sale works out tax and change
+    tendered = 2 * sum(item["price"] for item in items)
+    sale_data = SaleCreate(
+        customer_id=customer_id, items=items, amount_paid=tendered, payment_method=PaymentMethod.CASH
+    )
+    return build_sale(sale_data, tenant_id, store_id, "bench")
+
+
+async def sequential_writes(sale_obj):
+    """The same writes as record_sale_writes, one awaited round trip at a time, kept for comparison"""
+    await db.sales.insert_one(sale_obj.dict())
+    for item in sale_obj.items:
+        await db.medicines.update_one({"id": item["medicine_id"]}, stock_adjustment_update(-item["quantity"]))
+    if sale_obj.customer_id:
+        await db.customers.update_one(
+            {"id": sale_obj.customer_id},
+            {"$inc": {
+                "loyalty_points": sale_obj.loyalty_points_earned - sale_obj.loyalty_points_used,
+                "total_spent": sale_obj.total_amount
+            }}
+        )
+    daily_ops, medicine_ops = sales_rollup_ops([sale_obj])
+    for op in daily_ops:
+        await db.sales_daily_rollups.bulk_write([op])
+    for op in medicine_ops:
+        await db.sales_daily_medicine_rollups.bulk_write([op])
+    keys = []
+    if sale_obj.items:
+        keys += version_keys(sale_obj.tenant_id, "medicines")
+        keys += version_keys(sale_obj.tenant_id, "medicines", [sale_obj.store_id])
+    if sale_obj.customer_id:
+        keys += version_keys(sale_obj.tenant_id, "customers")
+    for key in keys:
+        await db.collection_versions.update_one({"_id": key}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def cleanup(tenant_id):
+    """Remove a benchmark tenant's documents, rollups and list versions"""
+    for collection in TENANT_COLLECTIONS:
+        await db[collection].delete_many({"tenant_id": tenant_id})
+    await db.collection_versions.delete_many({"_id": {"$regex": f"^{tenant_id}:"}})
+
+
+async def time_strategy(strategy, make_sale, iterations):
+    latencies = []
+    for _ in range(iterations):
+        sale_obj = make_sale()
+        started = time.perf_counter()
+        await strategy(sale_obj)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def main(iterations, basket_sizes):
+    server.mongo.connect()
+    tenant_id, store_id, medicines = await seed_medicines(max(basket_sizes))
+    customer_id = str(uuid.uuid4())
+    await db.customers.insert_one({"id": customer_id, "tenant_id": tenant_id, "loyalty_points": 0, "total_spent": 0.0})
+
+    try:
+        print(f"{'basket':>8} {'strategy':>12} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+        for size in basket_sizes:
+            make_sale = lambda: basket_sale(tenant_id, store_id, medicines, size, customer_id)  # noqa: E731
+            for label, strategy in (("sequential", sequential_writes), ("bulk_write", record_sale_writes)):
+                latencies = await time_strategy(strategy, make_sale, iterations)
+                print(
+                    f"{size:>8} {label:>12} {statistics.median(latencies):>9.2f} "
+                    f"{percentile(latencies, 95):>9.2f} {statistics.mean(latencies):>9.2f}"
+                )
+    finally:
+        await cleanup(tenant_id)
+        server.mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--baskets", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.baskets))
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Synthetic Data Generator
+Loads production-scale tenants into a database for performance work:
+stores, staff, medicines with expiry and batch data, customers, prescriptions
+and years of sales, with the daily sales rollups that analytics reads.
+Documents carry every field of the matching server.py model, and each
+collection's first document per tenant is validated against its model.
+
+Sales are priced by server.build_sale, so totals and loyalty points follow
+the same rules as create_sale.
+
+Tenants are generated in parallel worker processes with unordered bulk
+inserts. Every tenant draws from its own Random(seed, index), so the same
+--seed and --as-of always produce the same data whatever the process count.
+
+    python benchmarks/generate_data.py --preset small
+    python benchmarks/generate_data.py --preset large --db-name pharmacloud_large --processes 16
+
+Every generated user logs in with --password, for example
+owner@<subdomain>.pharmacloud-synthetic.com.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pymongo import MongoClient
+
+os.environ.setdefault("DB_NAME", "pharmacloud_synthetic")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import (  # noqa: E402
+    Customer,
+    INDEX_REGISTRY,
+    Medicine,
+    MedicineCategory,
+    PaymentMethod,
+    PLAN_FEATURES,
+    PLAN_MAX_STORES,
+    Prescription,
+    PrescriptionStatus,
+    Sale,
+    SaleCreate,
+    Store,
+    SubscriptionPlan,
+    SubscriptionStatus,
+    Tenant,
+    User,
+    UserRole,
+    build_sale as price_sale,
+    customer_search_keys,
+    get_password_hash,
+    medicine_search_terms,
+    sale_day,
+)
+from _common import fake_word  # noqa: E402
+
+# Per-tenant scale; stores are drawn from 1..max_stores per tenant
+PRESETS = {
+    "small": {
+        "tenants": 10, "max_stores": 2, "medicines": 300, "customers": 500,
+        "prescriptions": 500, "sales": 2_000, "years": 1,
+    },
+    "medium": {
+        "tenants": 100, "max_stores": 3, "medicines": 1_000, "customers": 2_000,
+        "prescriptions": 3_000, "sales": 10_000, "years": 2,
+    },
+    "large": {
+        "tenants": 1_000, "max_stores": 3, "medicines": 1_000, "customers": 3_000,
+        "prescriptions": 5_000, "sales": 10_000, "years": 3,
+    },
+}
+
+EMAIL_DOMAIN = "pharmacloud-synthetic.com"
+FIRST_NAMES = ["Maria", "James", "Aisha", "Wei", "Carlos", "Olga", "Kwame", "Priya", "Liam", "Fatima", "Noah", "Yuki"]
+LAST_NAMES = ["Garcia", "Smith", "Okafor", "Chen", "Silva", "Ivanova", "Mensah", "Patel", "Murphy", "Haddad", "Kim"]
+DOSAGE_FORMS = ["tablet", "capsule", "syrup", "injection", "cream", "inhaler"]
+STRENGTHS = ["5mg", "10mg", "20mg", "50mg", "250mg", "500mg", "5ml", "10ml"]
+SIDE_EFFECTS = ["nausea", "headache", "dizziness", "drowsiness", "rash", "dry mouth"]
+ALLERGIES = ["penicillin", "sulfa", "latex", "aspirin", "codeine"]
+CONDITIONS = ["hypertension", "diabetes", "asthma", "arthritis", "high cholesterol"]
+PAYMENT_WEIGHTS = {PaymentMethod.CASH: 30, PaymentMethod.CARD: 55, PaymentMethod.INSURANCE: 10, PaymentMethod.DIGITAL_WALLET: 5}
+STATUS_WEIGHTS = {
+    PrescriptionStatus.FILLED: 70, PrescriptionStatus.PENDING: 15, PrescriptionStatus.PARTIALLY_FILLED: 5,
+    PrescriptionStatus.ON_HOLD: 5, PrescriptionStatus.CANCELLED: 5,
+}
+
+
+def fake_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def check_schema(model, doc):
+    """Fail fast if the generator drifts from a server model"""
+    missing = set(model.model_fields) - set(doc)
+    if missing:
+        raise ValueError(f"{model.__name__} documents are missing {sorted(missing)}")
+    model(**doc)
+
+
+def plan_for(store_count):
+    for plan in (SubscriptionPlan.STARTER, SubscriptionPlan.PROFESSIONAL, SubscriptionPlan.ENTERPRISE):
+        if store_count <= PLAN_MAX_STORES[plan]:
+            return plan
+
+
+# Document builders
+def build_tenant(rng, index, store_count, as_of):
+    plan = plan_for(store_count)
+    created_at = as_of - timedelta(days=rng.randint(365, 365 * 5))
+    return {
+        "id": fake_id(rng),
+        "name": f"{fake_word(rng)} Pharmacy {index}",
+        "subdomain": f"synthetic-{index}",
+        "subscription_plan": plan,
+        "subscription_status": rng.choices(
+            [SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING, SubscriptionStatus.PAST_DUE], [90, 7, 3]
+        )[0],
+        "subscription_expires_at": as_of + timedelta(days=rng.randint(1, 365)),
+        "max_stores": PLAN_MAX_STORES[plan],
+        "features_enabled": PLAN_FEATURES[plan],
+        "created_at": created_at,
+        "is_active": True,
+    }
+
+
+def build_store(rng, tenant, number):
+    return {
+        "id": fake_id(rng),
+        "tenant_id": tenant["id"],
+        "name": f"{tenant['name']} #{number}",
+        "license_number": f"PH-{rng.randint(100000, 999999)}",
+        "address": f"{rng.randint(1, 9999)} {fake_word(rng)} Street",
+        "phone": f"555-{rng.randint(1000000, 9999999)}",
+        "email": f"store{number}@{tenant['subdomain']}.{EMAIL_DOMAIN}",
+        "operating_hours": {day: "08:00-21:00" for day in ("monday", "tuesday", "wednesday", "thursday", "friday")},
+        "tax_rate": 0.08,
+        "is_active": True,
+        "created_at": tenant["created_at"],
+    }
+
+
+def build_user(rng, tenant, role, local_part, store_ids, hashed_password, as_of):
+    return {
+        "id": fake_id(rng),
+        "tenant_id": tenant["id"],
+        "email": f"{local_part}@{tenant['subdomain']}.{EMAIL_DOMAIN}",
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "role": role,
+        "phone": f"555-{rng.randint(1000000, 9999999)}",
+        "license_number": f"RPH-{rng.randint(10000, 99999)}" if role == UserRole.PHARMACIST else None,
+        "store_ids": store_ids,
+        "permissions": [],
+        "is_active": True,
+        "created_at": tenant["created_at"],
+        "last_login": as_of - timedelta(hours=rng.randint(1, 24 * 30)),
+        "hashed_password": hashed_password,
+        "token_version": 0,
+    }
+
+
+def build_medicine(rng, tenant, store_id, as_of):
+    category = rng.choice(list(MedicineCategory))
+    controlled = category == MedicineCategory.CONTROLLED
+    unit_cost = round(rng.uniform(0.5, 60), 2)
+    min_stock = rng.choice([10, 20, 50])
+    quantity = rng.randint(0, 600)
+    created_at = as_of - timedelta(days=rng.randint(0, 720))
+    medicine = {
+        "id": fake_id(rng),
+        "tenant_id": tenant["id"],
+        "store_id": store_id,
+        "name": f"{fake_word(rng)} {rng.choice(STRENGTHS)}",
+        "brand_name": fake_word(rng) if rng.random() < 0.7 else None,
+        "generic_name": fake_word(rng).lower(),
+        "ndc_number": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}",
+        "category": category,
+        "dosage_form": rng.choice(DOSAGE_FORMS),
+        "strength": rng.choice(STRENGTHS),
+        "manufacturer": f"{fake_word(rng)} Pharma",
+        "supplier_id": None,
+        "barcode": str(rng.randint(10 ** 11, 10 ** 12 - 1)),
+        "prescription_required": category != MedicineCategory.OVER_COUNTER,
+        "controlled_substance": controlled,
+        "dea_schedule": rng.choice(["II", "III", "IV"]) if controlled else None,
+        "unit_cost": unit_cost,
+        "selling_price": round(unit_cost * rng.uniform(1.2, 2.5), 2),
+        "quantity_in_stock": quantity,
+        "min_stock_level": min_stock,
+        "max_stock_level": min_stock * 20,
+        # A slice of every formulary is already expired or about to
+        "expiry_date": as_of + timedelta(days=rng.randint(-30, 900)),
+        "batch_number": f"B{rng.randint(100000, 999999)}",
+        "storage_conditions": rng.choice([None, "Store below 25C", "Refrigerate 2-8C"]),
+        "side_effects": rng.sample(SIDE_EFFECTS, rng.randint(0, 3)),
+        "contraindications": [],
+        "interactions": [],
+        "is_low_stock": quantity <= min_stock,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+    medicine["search_terms"] = medicine_search_terms(medicine)
+    return medicine
+
+
+def build_customer(rng, tenant, number, as_of):
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    customer = {
+        "id": fake_id(rng),
+        "tenant_id": tenant["id"],
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": f"{first_name.lower()}.{last_name.lower()}{number}@{tenant['subdomain']}.{EMAIL_DOMAIN}",
+        "phone": f"555-{rng.randint(1000000, 9999999)}",
+        "date_of_birth": as_of - timedelta(days=rng.randint(18 * 365, 90 * 365)),
+        "address": f"{rng.randint(1, 9999)} {fake_word(rng)} Avenue",
+        "insurance_info": {"provider": f"{fake_word(rng)} Health", "member_id": str(rng.randint(10 ** 8, 10 ** 9))}
+        if rng.random() < 0.6 else None,
+        "allergies": rng.sample(ALLERGIES, rng.randint(0, 2)),
+        "medical_conditions": rng.sample(CONDITIONS, rng.randint(0, 2)),
+        "emergency_contact": None,
+        "loyalty_points": 0,
+        "total_spent": 0.0,
+        "is_active": rng.random() < 0.97,
+        "created_at": as_of - timedelta(days=rng.randint(0, 365 * 3)),
+    }
+    customer.update(customer_search_keys(customer))
+    return customer
+
+
+def build_prescription(rng, tenant, store_id, customer, medicines, pharmacist_id, as_of):
+    prescribed = as_of - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+    status = rng.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()))[0]
+    filled = status in (PrescriptionStatus.FILLED, PrescriptionStatus.PARTIALLY_FILLED)
+    refills_allowed = rng.choice([0, 0, 1, 2, 5])
+    return {
+        "id": fake_id(rng),
+        "tenant_id": tenant["id"],
+        "store_id": store_id,
+        "customer_id": customer["id"],
+        "doctor_name": f"Dr. {rng.choice(LAST_NAMES)}",
+        "doctor_phone": f"555-{rng.randint(1000000, 9999999)}",
+        "doctor_license": f"MD-{rng.randint(100000, 999999)}",
+        "prescription_number": f"RX-{prescribed:%Y%m%d}-{rng.getrandbits(32):08x}",
+        "date_prescribed": prescribed,
+        "medications": [
+            {
+                "medicine_id": medicine["id"],
+                "medicine_name": medicine["name"],
+                "quantity": rng.choice([14, 30, 60, 90]),
+                "dosage": rng.choice(["once daily", "twice daily", "as needed"]),
+            }
+            for medicine in rng.sample(medicines, min(len(medicines), rng.randint(1, 3)))
+        ],
+        "status": status,
+        "refills_allowed": refills_allowed,
+        "refills_used": rng.randint(0, refills_allowed) if filled else 0,
+        "days_supply": rng.choice([7, 14, 30, 90]),
+        "counseling_notes": None,
+        "pharmacist_id": pharmacist_id if filled else None,
+        "filled_at": prescribed + timedelta(hours=rng.randint(1, 72)) if filled else None,
+        "pickup_instructions": None,
+        "created_at": prescribed,
+    }
+
+
+def build_sale(rng, tenant, store_id, medicines, customers, cashier_id, created_at):
+    items = [
+        {
+            "medicine_id": medicine["id"],
+            "medicine_name": medicine["name"],
+            "quantity": rng.choices([1, 2, 3, 4], [70, 20, 7, 3])[0],
+            "price": medicine["selling_price"],
+        }
+        for medicine in rng.sample(medicines, min(len(medicines), rng.choices([1, 2, 3, 5, 8], [45, 25, 15, 10, 5])[0]))
+    ]
+    payment_method = rng.choices(list(PAYMENT_WEIGHTS), list(PAYMENT_WEIGHTS.values()))[0]
+    subtotal = sum(item["price"] * item["quantity"] for item in items)
+    customer = rng.choice(customers) if customers and rng.random() < 0.55 else None
+    sale_data = SaleCreate(
+        customer_id=customer["id"] if customer else None,
+        items=items,
+        insurance_coverage=round(subtotal * 0.6, 2) if payment_method == PaymentMethod.INSURANCE else 0.0,
+        amount_paid=0.0,
+        payment_method=payment_method,
+    )
+    overrides = {
+        "id": fake_id(rng),
+        "receipt_number": f"RCP-{created_at:%Y%m%d}-{rng.getrandbits(32):08x}",
+        "created_at": created_at,
+    }
+    # Price the basket first, then tender: exact for cards, rounded up in cash
+    total_amount = price_sale(sale_data, tenant["id"], store_id, cashier_id, **overrides).total_amount
+    sale_data.amount_paid = total_amount if payment_method != PaymentMethod.CASH else float(
+        int(total_amount) + rng.choice([1, 5, 10])
+    )
+    return price_sale(sale_data, tenant["id"], store_id, cashier_id, **overrides).dict()
+
+
+def sale_times(rng, count, as_of, years):
+    """Sale timestamps over `years` up to the day before `as_of`, denser in recent months and opening hours"""
+    span_days = 365 * years
+    for _ in range(count):
+        days_ago = 1 + int(span_days * (rng.random() ** 1.5))
+        hour = rng.choices(range(8, 21), [3, 5, 7, 8, 9, 9, 8, 7, 7, 8, 8, 6, 4])[0]
+        yield (as_of - timedelta(days=days_ago)).replace(hour=hour, minute=rng.randint(0, 59), second=rng.randint(0, 59))
+
+
+def sales_rollups(sales):
+    """Daily store and per-medicine rollup documents, as create_sale would have left them"""
+    daily = {}
+    per_medicine = {}
+    for sale in sales:
+        key = (sale["tenant_id"], sale["store_id"], sale_day(sale["created_at"]))
+        totals = daily.setdefault(key, {"total_sales": 0.0, "transaction_count": 0})
+        totals["total_sales"] += sale["total_amount"]
+        totals["transaction_count"] += 1
+        for item in sale["items"]:
+            medicine_totals = per_medicine.setdefault(
+                (*key, item["medicine_id"]),
+                {"medicine_name": item["medicine_name"], "total_quantity": 0, "total_revenue": 0.0}
+            )
+            medicine_totals["total_quantity"] += item["quantity"]
+            medicine_totals["total_revenue"] += item["price"] * item["quantity"]
+    daily_docs = [
+        {"tenant_id": tenant_id, "store_id": store_id, "day": day, **totals}
+        for (tenant_id, store_id, day), totals in daily.items()
+    ]
+    medicine_docs = [
+        {"tenant_id": tenant_id, "store_id": store_id, "day": day, "medicine_id": medicine_id, **totals}
+        for (tenant_id, store_id, day, medicine_id), totals in per_medicine.items()
+    ]
+    return daily_docs, medicine_docs
+
+
+# Worker processes
+_database = None
+
+
+def init_worker(mongo_url, db_name):
+    global _database
+    _database = MongoClient(mongo_url)[db_name]
+
+
+def insert_batches(collection, docs, batch_size):
+    for start in range(0, len(docs), batch_size):
+        _database[collection].insert_many(docs[start:start + batch_size], ordered=False)
+
+
+def build_tenant_documents(index, scale, seed, as_of, hashed_password):
+    """Every document for one tenant, keyed by collection; first documents are checked against their models"""
+    rng = random.Random(f"{seed}:{index}")
+
+    store_count = rng.randint(scale.get("min_stores", 1), scale["max_stores"])
+    tenant = build_tenant(rng, index, store_count, as_of)
+    stores = [build_store(rng, tenant, number) for number in range(1, store_count + 1)]
+    store_ids = [store["id"] for store in stores]
+
+    users = [build_user(rng, tenant, UserRole.PHARMACY_OWNER, "owner", store_ids, hashed_password, as_of)]
+    users.append(build_user(rng, tenant, UserRole.PHARMACY_MANAGER, "manager", store_ids, hashed_password, as_of))
+    staff = {}
+    for number, store_id in enumerate(store_ids, start=1):
+        pharmacist = build_user(
+            rng, tenant, UserRole.PHARMACIST, f"pharmacist{number}", [store_id], hashed_password, as_of
+        )
+        cashier = build_user(rng, tenant, UserRole.CASHIER, f"cashier{number}", [store_id], hashed_password, as_of)
+        users += [pharmacist, cashier]
+        staff[store_id] = (pharmacist["id"], [pharmacist["id"], cashier["id"]])
+
+    medicines = {
+        store_id: [build_medicine(rng, tenant, store_id, as_of) for _ in range(scale["medicines"])]
+        for store_id in store_ids
+    }
+    customers = [build_customer(rng, tenant, number, as_of) for number in range(scale["customers"])]
+    prescriptions = []
+    for _ in range(scale["prescriptions"] if customers else 0):
+        store_id = rng.choice(store_ids)
+        prescriptions.append(build_prescription(
+            rng, tenant, store_id, rng.choice(customers), medicines[store_id], staff[store_id][0], as_of
+        ))
+
+    sales = []
+    for created_at in sale_times(rng, scale["sales"], as_of, scale["years"]):
+        store_id = rng.choice(store_ids)
+        sales.append(build_sale(
+            rng, tenant, store_id, medicines[store_id], customers, rng.choice(staff[store_id][1]), created_at
+        ))
+
+    # Loyalty balances and lifetime spend consistent with the sales
+    by_id = {customer["id"]: customer for customer in customers}
+    for sale in sales:
+        if sale["customer_id"]:
+            customer = by_id[sale["customer_id"]]
+            customer["loyalty_points"] += sale["loyalty_points_earned"] - sale["loyalty_points_used"]
+            customer["total_spent"] += sale["total_amount"]
+
+    all_medicines = [medicine for store_medicines in medicines.values() for medicine in store_medicines]
+    daily_rollups, medicine_rollups = sales_rollups(sales)
+    collections = {
+        "tenants": (Tenant, [tenant]),
+        "stores": (Store, stores),
+        "users": (User, users),
+        "medicines": (Medicine, all_medicines),
+        "customers": (Customer, customers),
+        "prescriptions": (Prescription, prescriptions),
+        "sales": (Sale, sales),
+        "sales_daily_rollups": (None, daily_rollups),
+        "sales_daily_medicine_rollups": (None, medicine_rollups),
+    }
+    documents = {}
+    for collection, (model, docs) in collections.items():
+        if not docs:
+            continue
+        if model is not None:
+            check_schema(model, docs[0])
+        documents[collection] = docs
+    return documents
+
+
+def generate_tenant(task):
+    """Generate and insert one tenant; returns document counts per collection"""
+    index, scale, seed, as_of, hashed_password, batch_size = task
+    counts = {}
+    for collection, docs in build_tenant_documents(index, scale, seed, as_of, hashed_password).items():
+        insert_batches(collection, docs, batch_size)
+        counts[collection] = len(docs)
+    return counts
+
+
+def main(args):
+    scale = dict(PRESETS[args.preset])
+    for key in scale:
+        override = getattr(args, key)
+        if override is not None:
+            scale[key] = override
+    mongo_url = args.mongo_url or os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    as_of = datetime.strptime(args.as_of, "%Y-%m-%d") if args.as_of else datetime.utcnow().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+    client = MongoClient(mongo_url)
+    database = client[args.db_name]
+    if args.drop:
+        client.drop_database(args.db_name)
+    elif database.tenants.count_documents({"subdomain": {"$regex": "^synthetic-"}}, limit=1):
+        sys.exit(f"{args.db_name} already has synthetic tenants; pass --drop to replace them")
+
+    print(f"Generating preset {args.preset!r} into {args.db_name} with {args.processes} processes: {scale}")
+    # bcrypt once; every generated user shares the password
+    hashed_password = get_password_hash(args.password)
+    tasks = [
+        (index, scale, args.seed, as_of, hashed_password, args.batch_size)
+        for index in range(scale["tenants"])
+    ]
+    totals = Counter()
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.processes, initializer=init_worker, initargs=(mongo_url, args.db_name)) as pool:
+        for done, counts in enumerate(pool.map(generate_tenant, tasks, chunksize=1), start=1):
+            totals.update(counts)
+            if done % max(1, scale["tenants"] // 20) == 0 or done == scale["tenants"]:
+                elapsed = time.perf_counter() - started
+                print(f"  {done}/{scale['tenants']} tenants, {totals['sales']:,} sales, {elapsed:.0f}s")
+
+    if not args.skip_indexes:
+        print("Building indexes...")
+        for spec in INDEX_REGISTRY:
+            database[spec.collection].create_index(spec.keys, **spec.options)
+    client.close()
+
+    elapsed = time.perf_counter() - started
+    for collection, count in totals.items():
+        print(f"{collection:>30} {count:>12,}")
+    print(f"Loaded {sum(totals.values()):,} documents in {elapsed:.1f}s "
+          f"({sum(totals.values()) / elapsed:,.0f} docs/s)")
+    print(f"Log in as owner@synthetic-0.{EMAIL_DOMAIN} (subdomain synthetic-0) with password {args.password!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--as-of", help="Anchor date YYYY-MM-DD for generated history (default today, UTC)")
+    parser.add_argument("--mongo-url", help="Defaults to MONGO_URL")
+    parser.add_argument("--db-name", default=os.environ["DB_NAME"])
+    parser.add_argument("--drop", action="store_true", help="Drop the database first")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents per insert_many")
+    parser.add_argument("--password", default="synthetic-password", help="Password for every generated user")
+    parser.add_argument("--skip-indexes", action="store_true", help="Leave index builds to manage.py create-indexes")
+    overrides = parser.add_argument_group("scale overrides (per tenant unless noted)")
+    overrides.add_argument("--tenants", type=int, help="Number of tenants")
+    overrides.add_argument("--max-stores", dest="max_stores", type=int)
+    overrides.add_argument("--medicines", type=int, help="Medicines per store")
+    overrides.add_argument("--customers", type=int)
+    overrides.add_argument("--prescriptions", type=int)
+    overrides.add_argument("--sales", type=int)
+    overrides.add_argument("--years", type=int, help="Years of sales history")
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Login Storm Load Test
+Measures latency of an unrelated endpoint (GET /api/stores) while a burst of logins runs,
+to confirm bcrypt work no longer stalls the event loop.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from _common import percentile
+
+
+class LoginStormTester:
+    def __init__(self, base_url, email, password, subdomain=None):
+        self.base_url = base_url.rstrip("/")
+        self.email = email
+        self.password = password
+        self.subdomain = subdomain
+        self.token = None
+
+    def log(self, message, level="INFO"):
+        """Log test messages with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        print(f"[{timestamp}] {level}: {message}")
+
+    def login(self):
+        payload = {"email": self.email, "password": self.password}
+        if self.subdomain:
+            payload["subdomain"] = self.subdomain
+        response = requests.post(f"{self.base_url}/auth/login", json=payload)
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    def probe_latencies(self, duration, stop_event=None):
+        """Hit GET /stores sequentially for `duration` seconds and return latencies in ms"""
+        headers = {"Authorization": f"Bearer {self.token}"}
+        latencies = []
+        session = requests.Session()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline and not (stop_event and stop_event.is_set()):
+            started = time.perf_counter()
+            session.get(f"{self.base_url}/stores", headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    def login_storm(self, concurrency, total_logins):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: self.login(), range(total_logins)))
+
+    def summarize(self, label, latencies):
+        self.log(
+            f"{label}: n={len(latencies)} "
+            f"p50={percentile(latencies, 50):.1f}ms "
+            f"p99={percentile(latencies, 99):.1f}ms "
+            f"mean={statistics.mean(latencies) if latencies else 0:.1f}ms"
+        )
+
+    def run(self, duration, concurrency, total_logins):
+        self.token = self.login()
+
+        self.log("Measuring baseline latency of GET /stores")
+        baseline = self.probe_latencies(duration)
+        self.summarize("baseline", baseline)
+
+        self.log(f"Measuring GET /stores during {total_logins} logins at concurrency {concurrency}")
+        storm = threading.Thread(target=self.login_storm, args=(concurrency, total_logins))
+        storm_started = time.perf_counter()
+        storm.start()
+        during = self.probe_latencies(duration)
+        storm.join()
+        self.summarize("during login storm", during)
+        self.log(f"Login storm finished in {time.perf_counter() - storm_started:.1f}s")
+
+        return {"baseline": baseline, "during_storm": during}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8001/api")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--subdomain")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per measurement window")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=500)
+    args = parser.parse_args()
+
+    tester = LoginStormTester(args.base_url, args.email, args.password, args.subdomain)
+    tester.run(args.duration, args.concurrency, args.logins)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Bulk Medicine Import Benchmark
+Streams a generated CSV or NDJSON formulary to POST /api/medicines/import
+and reports rows/second. Rows are generated on the fly, so neither side
+holds the whole file in memory.
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+CSV_COLUMNS = [
+    "name", "generic_name", "brand_name", "ndc_number", "category", "dosage_form", "strength",
+    "manufacturer", "unit_cost", "selling_price", "quantity_in_stock", "min_stock_level",
+    "max_stock_level", "expiry_date", "batch_number", "side_effects",
+]
+CATEGORIES = ["prescription", "over_counter", "antibiotic", "supplement"]
+
+
+def generate_rows(count, seed, invalid_ratio):
+    rng = random.Random(seed)
+    for i in range(count):
+        row = {
+            "name": f"Medicine {i}",
+            "generic_name": f"genericol-{i % 5000}",
+            "brand_name": f"Brand {i % 700}",
+            "ndc_number": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}",
+            "category": rng.choice(CATEGORIES),
+            "dosage_form": rng.choice(["tablet", "capsule", "syrup"]),
+            "strength": f"{rng.choice([5, 10, 250, 500])}mg",
+            "manufacturer": f"Maker {i % 50}",
+            "unit_cost": round(rng.uniform(0.5, 40), 2),
+            "selling_price": round(rng.uniform(1, 80), 2),
+            "quantity_in_stock": rng.randint(0, 500),
+            "min_stock_level": 20,
+            "max_stock_level": 600,
+            "expiry_date": (datetime.utcnow() + timedelta(days=rng.randint(10, 900))).isoformat(),
+            "batch_number": f"B{rng.randint(100000, 999999)}",
+            "side_effects": ["nausea", "headache"],
+        }
+        if rng.random() < invalid_ratio:
+            row["quantity_in_stock"] = "lots"
+        yield row
+
+
+def ndjson_body(rows):
+    for row in rows:
+        yield (json.dumps(row) + "\n").encode()
+
+
+def csv_body(rows):
+    yield (",".join(CSV_COLUMNS) + "\n").encode()
+    for row in rows:
+        values = [";".join(row[c]) if isinstance(row[c], list) else str(row[c]) for c in CSV_COLUMNS]
+        yield (",".join(values) + "\n").encode()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8001/api")
+    parser.add_argument("--token", required=True, help="Access token of a pharmacist/manager/owner")
+    parser.add_argument("--store-id", required=True)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="ndjson")
+    parser.add_argument("--invalid-ratio", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows, args.seed, args.invalid_ratio)
+    body = csv_body(rows) if args.format == "csv" else ndjson_body(rows)
+
+    started = time.perf_counter()
+    response = requests.post(
+        f"{args.base_url}/medicines/import",
+        params={"store_id": args.store_id, "format": args.format},
+        headers={"Authorization": f"Bearer {args.token}"},
+        data=body,
+    )
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    summary = response.json()
+
+    print(f"rows:              {summary['rows']}")
+    print(f"inserted:          {summary['inserted']}")
+    print(f"failed:            {summary['failed']}")
+    print(f"low-stock alerts:  {summary['low_stock_notifications']}")
+    print(f"server rows/sec:   {summary['rows_per_second']}")
+    print(f"client rows/sec:   {summary['rows'] / elapsed:.1f} ({elapsed:.1f}s end to end)")
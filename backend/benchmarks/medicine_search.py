@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Medicine Search Benchmark
+Seeds one tenant with N medicines (default 100k) and times the ranked
+aggregation GET /medicines?search= runs, matching with the legacy
+case-insensitive regex $or versus the indexed search_terms prefix query.
+Requires a local mongod (MONGO_URL).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "pharmacloud_bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+from server import (  # noqa: E402
+    db,
+    medicine_list_filter,
+    medicine_rank_keys,
+    medicine_search_pipeline,
+    medicine_search_terms,
+)
+from _common import SYLLABLES, fake_word, percentile  # noqa: E402
+
+PAGE_SIZE = 50
+# The projection get_medicines uses for a full-document search page
+PROJECTION = {"_id": 0, "search_terms": 0}
+
+
+async def seed(count, rng):
+    tenant_id = str(uuid.uuid4())
+    store_id = str(uuid.uuid4())
+    batch = []
+    for i in range(count):
+        medicine = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "store_id": store_id,
+            "name": f"{fake_word(rng)} {rng.choice([5, 10, 20, 250, 500])}mg",
+            "generic_name": fake_word(rng).lower(),
+            "brand_name": fake_word(rng),
+            "ndc_number": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}",
+            "created_at": datetime.utcnow(),
+            "expiry_date": datetime.utcnow() + timedelta(days=rng.randint(1, 720)),
+        }
+        medicine["search_terms"] = medicine_search_terms(medicine)
+        medicine.update(medicine_rank_keys(medicine))
+        batch.append(medicine)
+        if len(batch) >= 5000:
+            await db.medicines.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.medicines.insert_many(batch, ordered=False)
+    await db.medicines.create_index([("tenant_id", 1), ("search_terms", 1)])
+    return tenant_id
+
+
+def regex_query(tenant_id, search):
+    return {
+        "tenant_id": tenant_id,
+        "$or": [
+            {"name": {"$regex": search, "$options": "i"}},
+            {"generic_name": {"$regex": search, "$options": "i"}},
+            {"brand_name": {"$regex": search, "$options": "i"}},
+            {"ndc_number": {"$regex": search, "$options": "i"}},
+        ],
+    }
+
+
+def indexed_query(tenant_id, search):
+    return medicine_list_filter(tenant_id, None, [], search=search)
+
+
+def ranked_pipeline(query_builder, tenant_id, search):
+    """The route's first-page pipeline, with the $match swapped for the strategy under test"""
+    return medicine_search_pipeline(query_builder(tenant_id, search), PROJECTION, search, PAGE_SIZE + 1)
+
+
+def docs_examined(explain):
+    """Sum totalDocsExamined wherever the server reports it in an aggregate explain"""
+    if isinstance(explain, dict):
+        return explain.get("totalDocsExamined", 0) + sum(docs_examined(value) for value in explain.values())
+    if isinstance(explain, list):
+        return sum(docs_examined(item) for item in explain)
+    return 0
+
+
+async def measure(query_builder, tenant_id, searches):
+    latencies = []
+    for search in searches:
+        pipeline = ranked_pipeline(query_builder, tenant_id, search)
+        started = time.perf_counter()
+        await db.medicines.aggregate(pipeline).to_list(PAGE_SIZE + 1)
+        latencies.append((time.perf_counter() - started) * 1000)
+    explain = await db.command({
+        "explain": {
+            "aggregate": "medicines",
+            "pipeline": ranked_pipeline(query_builder, tenant_id, searches[0]),
+            "cursor": {},
+        },
+        "verbosity": "executionStats",
+    })
+    return latencies, docs_examined(explain)
+
+
+async def main(count, queries, seed_value):
+    server.mongo.connect()
+    rng = random.Random(seed_value)
+    print(f"Seeding {count} medicines...")
+    tenant_id = await seed(count, rng)
+    # Type-ahead keystrokes: 1-4 character prefixes of real syllables
+    searches = ["".join(rng.choice(SYLLABLES) for _ in range(2))[: rng.randint(1, 4)] for _ in range(queries)]
+
+    try:
+        print(f"{'strategy':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'docs examined':>14}")
+        for label, builder in (("regex", regex_query), ("indexed", indexed_query)):
+            latencies, examined = await measure(builder, tenant_id, searches)
+            p95, p99 = percentile(latencies, 95), percentile(latencies, 99)
+            print(f"{label:>10} {statistics.median(latencies):>9.2f} {p95:>9.2f} {p99:>9.2f} {str(examined):>14}")
+    finally:
+        await db.medicines.delete_many({"tenant_id": tenant_id})
+        server.mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--medicines", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main(args.medicines, args.queries, args.seed))
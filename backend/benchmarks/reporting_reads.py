@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Reporting Read Routing Benchmark
+Measures create_sale write latency while heavy sales reports run, with the
+reports routed to the primary and then to secondaries (reporting_db).
+Requires a replica set. A local three-member set for testing:
+
+    mkdir -p /tmp/rs/{0,1,2}
+    for i in 0 1 2; do
+        mongod --replSet rs0 --port 2701$i --dbpath /tmp/rs/$i --bind_ip localhost --fork --logpath /tmp/rs/$i.log
+    done
+    mongosh --port 27010 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27010"}, {_id: 1, host: "localhost:27011"}, {_id: 2, host: "localhost:27012"}]})'
+
+    MONGO_URL="mongodb://localhost:27010,localhost:27011,localhost:27012/?replicaSet=rs0" \\
+        python benchmarks/reporting_reads.py
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "pharmacloud_bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+from server import db, record_sale_writes, reporting_db  # noqa: E402
+from checkout_writes import basket_sale, cleanup, seed_medicines  # noqa: E402
+from _common import percentile  # noqa: E402
+
+
+async def seed_sales(tenant_id, store_id, medicines, count, rng):
+    """Historical sales for the reports to chew through"""
+    batch = []
+    for _ in range(count):
+        items = [
+            {"medicine_id": med["id"], "medicine_name": med["name"], "quantity": rng.randint(1, 3), "price": 9.99}
+            for med in rng.sample(medicines, rng.randint(1, 5))
+        ]
+        total = sum(item["quantity"] * item["price"] for item in items)
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "store_id": store_id,
+            "items": items,
+            "total_amount": total,
+            "created_at": datetime.utcnow() - timedelta(days=rng.randint(0, 365)),
+        })
+        if len(batch) >= 5000:
+            await db.sales.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.sales.insert_many(batch, ordered=False)
+
+
+def heavy_report(tenant_id):
+    """Year-long per-medicine revenue straight from sales, the shape rollups replaced"""
+    return [
+        {"$match": {"tenant_id": tenant_id}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "medicine": "$items.medicine_id"},
+            "revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.price"]}},
+        }},
+        {"$sort": {"revenue": -1}},
+        {"$limit": 10},
+    ]
+
+
+async def report_loop(database, tenant_id, stop):
+    while not stop.is_set():
+        await database.sales.aggregate(heavy_report(tenant_id), allowDiskUse=True).to_list(10)
+
+
+async def checkout_latencies(make_sale, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        sale_obj = make_sale()
+        started = time.perf_counter()
+        await record_sale_writes(sale_obj)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def run_phase(label, database, tenant_id, make_sale, duration, reporters):
+    stop = asyncio.Event()
+    loops = []
+    if database is not None:
+        loops = [asyncio.create_task(report_loop(database, tenant_id, stop)) for _ in range(reporters)]
+    try:
+        latencies = await checkout_latencies(make_sale, duration)
+    finally:
+        stop.set()
+        await asyncio.gather(*loops, return_exceptions=True)
+    p95, p99 = percentile(latencies, 95), percentile(latencies, 99)
+    print(f"{label:>22} {len(latencies):>8} {statistics.median(latencies):>9.2f} {p95:>9.2f} {p99:>9.2f}")
+
+
+async def served_by(database, tenant_id):
+    explain = await database.sales.find({"tenant_id": tenant_id}).limit(1).explain()
+    info = explain.get("serverInfo", {})
+    return f"{info.get('host')}:{info.get('port')}"
+
+
+async def main(sales, duration, reporters, seed_value):
+    server.mongo.connect()
+    rng = random.Random(seed_value)
+    hello = await db.command("hello")
+    if "setName" not in hello:
+        print("Not connected to a replica set; reporting reads will hit the only member (see --help)")
+    tenant_id, store_id, medicines = await seed_medicines(50)
+    customer_id = str(uuid.uuid4())
+    await db.customers.insert_one({"id": customer_id, "tenant_id": tenant_id, "loyalty_points": 0, "total_spent": 0.0})
+    print(f"Seeding {sales} sales...")
+    await seed_sales(tenant_id, store_id, medicines, sales, rng)
+
+    try:
+        print(f"primary reads served by:   {await served_by(db, tenant_id)}")
+        print(f"reporting reads served by: {await served_by(reporting_db, tenant_id)}")
+        make_sale = lambda: basket_sale(tenant_id, store_id, medicines, rng.randint(1, 10), customer_id)  # noqa: E731
+        print(f"{'phase':>22} {'sales':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        await run_phase("no reports", None, tenant_id, make_sale, duration, reporters)
+        await run_phase("reports on primary", db, tenant_id, make_sale, duration, reporters)
+        await run_phase("reports on secondary", reporting_db, tenant_id, make_sale, duration, reporters)
+    finally:
+        await cleanup(tenant_id)
+        server.mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=200_000, help="Historical sales to seed")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--reporters", type=int, default=4, help="Concurrent report loops")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    asyncio.run(main(args.sales, args.duration, args.reporters, args.seed))
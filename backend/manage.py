@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+PharmaCloud Maintenance Commands
+One-off migrations and backfills. Run from the backend directory:
+
+    python manage.py --help
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import orjson
+import typer
+from fastapi.encoders import jsonable_encoder
+from pymongo import UpdateOne
+
+from server import (
+    create_indexes,
+    Customer,
+    customer_list_filter,
+    customer_search_page_size,
+    customer_search_keys,
+    db,
+    encode_cursor,
+    encode_rank_cursor,
+    EXPIRY_ALERT_DAYS,
+    expiry_candidate_filter,
+    expiring_count_filter,
+    expiry_summary_filter,
+    FAST_SERIALIZERS,
+    invalidate_all_versions,
+    keyset_query,
+    INDEX_REGISTRY,
+    keyset_sort,
+    LOW_STOCK_FLAG_STAGE,
+    MAX_PAGE_SIZE,
+    Medicine,
+    medicine_list_filter,
+    medicine_rank_keys,
+    medicine_search_pipeline,
+    medicine_search_terms,
+    MEDICINE_SEARCH_FIELDS,
+    mongo,
+    Notification,
+    prescription_list_filter,
+    PrescriptionStatus,
+    stock_adjustment_update,
+    Store,
+)
+
+cli = typer.Typer(help="PharmaCloud maintenance commands")
+
+
+def run(coro):
+    """Run a coroutine against a fresh Mongo connection and close it afterwards"""
+    mongo.connect()
+    try:
+        return asyncio.run(coro)
+    finally:
+        mongo.close()
+
+
+async def backfill(collection, query, projection, compute_set, batch_size):
+    """Apply `compute_set(doc)` as a $set to every matching document in bulk batches"""
+    ops = []
+    updated = 0
+    async for doc in collection.find(query, {"_id": 1, **projection}).batch_size(batch_size):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": compute_set(doc)}))
+        if len(ops) >= batch_size:
+            result = await collection.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+            ops = []
+    if ops:
+        result = await collection.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+    return updated
+
+
+@cli.command("create-indexes")
+def create_indexes_command(
+    collection: Optional[List[str]] = typer.Option(None, help="Only build indexes on these collections"),
+):
+    """Build every registered index; run once per deploy before starting workers"""
+    run(create_indexes(collections=collection or None))
+    specs = [spec for spec in INDEX_REGISTRY if not collection or spec.collection in collection]
+    typer.echo(f"Ensured {len(specs)} indexes on {len({spec.collection for spec in specs})} collections")
+
+
+@cli.command("backfill-medicine-search")
+def backfill_medicine_search(
+    batch_size: int = typer.Option(1000, help="Documents per bulk_write"),
+    only_missing: bool = typer.Option(True, help="Skip medicines that already have search_terms and rank keys"),
+):
+    """Populate search_terms and the normalized rank keys on existing medicines"""
+    query = {"$or": [
+        {"search_terms": {"$exists": False}}, {"search_name": {"$exists": False}}
+    ]} if only_missing else {}
+    updated = run(backfill(
+        db.medicines,
+        query,
+        {field: 1 for field in MEDICINE_SEARCH_FIELDS},
+        lambda doc: {"search_terms": medicine_search_terms(doc), **medicine_rank_keys(doc)},
+        batch_size,
+    ))
+    typer.echo(f"Updated search_terms and rank keys on {updated} medicines")
+
+
+@cli.command("backfill-customer-search")
+def backfill_customer_search(
+    batch_size: int = typer.Option(1000, help="Documents per bulk_write"),
+    only_missing: bool = typer.Option(True, help="Skip customers that already have search keys"),
+):
+    """Populate normalized phone/name/email search keys on existing customers"""
+    query = {"search_phone": {"$exists": False}} if only_missing else {}
+    updated = run(backfill(
+        db.customers,
+        query,
+        {"first_name": 1, "last_name": 1, "phone": 1, "email": 1},
+        customer_search_keys,
+        batch_size,
+    ))
+    typer.echo(f"Updated search keys on {updated} customers")
+
+
+
+@cli.command("backfill-low-stock")
+def backfill_low_stock():
+    """Compute is_low_stock on every medicine in one server-side update"""
+    async def backfill_flag():
+        result = await db.medicines.update_many({}, [LOW_STOCK_FLAG_STAGE])
+        # Medicine lists include the flag, so cached ETags are stale
+        await invalidate_all_versions()
+        return result
+
+    result = run(backfill_flag())
+    typer.echo(f"Updated is_low_stock on {result.modified_count} medicines")
+
+
+async def rebuild_rollups(tenant_id):
+    scope = {"tenant_id": tenant_id} if tenant_id else {}
+    await create_indexes(collections=["sales_daily_rollups", "sales_daily_medicine_rollups"])
+    await db.sales_daily_rollups.delete_many(scope)
+    await db.sales_daily_medicine_rollups.delete_many(scope)
+
+    day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+    await db.sales.aggregate([
+        {"$match": scope},
+        {"$group": {
+            "_id": {"tenant_id": "$tenant_id", "store_id": "$store_id", "day": day},
+            "total_sales": {"$sum": "$total_amount"},
+            "transaction_count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "tenant_id": "$_id.tenant_id",
+            "store_id": "$_id.store_id",
+            "day": "$_id.day",
+            "total_sales": 1,
+            "transaction_count": 1,
+        }},
+        {"$merge": {
+            "into": "sales_daily_rollups",
+            "on": ["tenant_id", "store_id", "day"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ], allowDiskUse=True).to_list(None)
+
+    await db.sales.aggregate([
+        {"$match": scope},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "tenant_id": "$tenant_id",
+                "store_id": "$store_id",
+                "day": day,
+                "medicine_id": "$items.medicine_id",
+            },
+            "medicine_name": {"$last": "$items.medicine_name"},
+            "total_quantity": {"$sum": "$items.quantity"},
+            "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "tenant_id": "$_id.tenant_id",
+            "store_id": "$_id.store_id",
+            "day": "$_id.day",
+            "medicine_id": "$_id.medicine_id",
+            "medicine_name": 1,
+            "total_quantity": 1,
+            "total_revenue": 1,
+        }},
+        {"$merge": {
+            "into": "sales_daily_medicine_rollups",
+            "on": ["tenant_id", "store_id", "day", "medicine_id"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ], allowDiskUse=True).to_list(None)
+
+    return (
+        await db.sales_daily_rollups.count_documents(scope),
+        await db.sales_daily_medicine_rollups.count_documents(scope),
+    )
+
+
+@cli.command("rebuild-sales-rollups")
+def rebuild_sales_rollups(
+    tenant_id: Optional[str] = typer.Option(None, help="Only rebuild this tenant"),
+):
+    """Recompute the daily sales rollups from sales history
+
+    Sales recorded while the rebuild runs may be counted twice or not at all,
+    so run it outside trading hours.
+    """
+    daily, per_medicine = run(rebuild_rollups(tenant_id))
+    typer.echo(f"Rebuilt {daily} daily rollups and {per_medicine} per-medicine rollups")
+
+
+
+async def reconcile_counts(batch_size):
+    """Rewrite every unread counter from the notifications collection"""
+    ops = []
+    repaired = 0
+    seen = set()
+    async for row in db.notifications.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}},
+    ], allowDiskUse=True):
+        seen.add(row["_id"])
+        ops.append(UpdateOne({"user_id": row["_id"]}, {"$set": {"unread": row["unread"]}}, upsert=True))
+        if len(ops) >= batch_size:
+            result = await db.notification_counters.bulk_write(ops, ordered=False)
+            repaired += result.modified_count + result.upserted_count
+            ops = []
+    if ops:
+        result = await db.notification_counters.bulk_write(ops, ordered=False)
+        repaired += result.modified_count + result.upserted_count
+
+    # Users with no unread notifications left
+    result = await db.notification_counters.update_many(
+        {"user_id": {"$nin": list(seen)}, "unread": {"$ne": 0}}, {"$set": {"unread": 0}}
+    )
+    return repaired + result.modified_count
+
+
+@cli.command("reconcile-unread-counts")
+def reconcile_unread_counts(
+    batch_size: int = typer.Option(1000, help="Counters per bulk_write"),
+):
+    """Repair drift between notification_counters and unread notifications
+
+    Counts are read and then written, so notifications created or read while
+    this runs can leave small drift; run it when traffic is low.
+    """
+    repaired = run(reconcile_counts(batch_size))
+    typer.echo(f"Repaired {repaired} unread counters")
+
+
+async def compare_serializers(sample_size):
+    mismatches = []
+    for collection, model in (("stores", Store), ("medicines", Medicine),
+                              ("customers", Customer), ("notifications", Notification)):
+        checked = 0
+        async for doc in db[collection].aggregate([{"$sample": {"size": sample_size}}, {"$project": {"_id": 0}}]):
+            expected = json.loads(json.dumps(jsonable_encoder(model(**doc))))
+            actual = orjson.loads(FAST_SERIALIZERS[model].dumps([doc]))[0]
+            # Legacy documents get fresh id/created_at values on both paths; only
+            # their presence can be compared
+            for name in FAST_SERIALIZERS[model].factories:
+                if name not in doc and actual.get(name) is not None and expected.get(name) is not None:
+                    actual[name] = expected[name]
+            if actual != expected:
+                mismatches.append((collection, doc.get("id"), expected, actual))
+            checked += 1
+        typer.echo(f"{collection:<14} checked {checked} documents")
+    return mismatches
+
+
+@cli.command("check-serialization-contract")
+def check_serialization_contract(
+    sample_size: int = typer.Option(200, help="Documents sampled per collection"),
+):
+    """Verify the FAST_JSON_RESPONSES output matches the response_model output on real documents"""
+    mismatches = run(compare_serializers(sample_size))
+    for collection, doc_id, expected, actual in mismatches[:20]:
+        diff = {key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)}
+        typer.echo(f"MISMATCH {collection} {doc_id}: {sorted(diff)}", err=True)
+    if mismatches:
+        raise typer.Exit(code=1)
+    typer.echo("Fast serialization matches the response models")
+
+
+def representative_queries():
+    """(route, collection, command) for each query shape the API issues"""
+    tenant, store, user, customer = "audit-tenant", "audit-store", "audit-user", "audit-customer"
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    horizon = now + timedelta(days=EXPIRY_ALERT_DAYS)
+    next_page = encode_cursor({"created_at": now, "id": "audit-last-id"})
+    next_search_page = encode_rank_cursor({"_rank": 8, "name": "Amoxicillin", "id": "audit-last-id"})
+
+    def find(collection, query, sort=None, limit=None):
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        if limit:
+            command["limit"] = limit
+        return command
+
+    def page(collection, query, direction=1, cursor=None):
+        """The find that find_page issues for one keyset page"""
+        return find(
+            collection, keyset_query(query, cursor, direction), keyset_sort(direction), MAX_PAGE_SIZE + 1
+        )
+
+    def count(collection, query):
+        return {"count": collection, "query": query}
+
+    def aggregate(collection, pipeline):
+        return {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+
+    def update(collection, query, change):
+        return {"update": collection, "updates": [{"q": query, "u": change}]}
+
+    return [
+        ("get_current_user", "users", find("users", {"email": "a@b.c"}, limit=1)),
+        ("login_user", "tenants", find("tenants", {"subdomain": "audit"}, limit=1)),
+        ("login_user", "users", update("users", {"id": user}, {"$set": {"last_login": now}})),
+        ("get_current_tenant", "tenants", find("tenants", {"id": tenant}, limit=1)),
+        ("TokenVersionCache", "users", find("users", {"id": {"$in": [user]}})),
+        ("create_store", "stores", count("stores", {"tenant_id": tenant, "is_active": True})),
+        ("get_stores", "stores", find("stores", {"tenant_id": tenant, "is_active": True, "id": {"$in": [store]}})),
+        ("get_medicines", "medicines", page(
+            "medicines", medicine_list_filter(tenant, store, [store]))),
+        ("get_medicines (next page)", "medicines", page(
+            "medicines", medicine_list_filter(tenant, None, []), cursor=next_page)),
+        ("get_medicines (search)", "medicines", aggregate("medicines", medicine_search_pipeline(
+            medicine_list_filter(tenant, None, [], search="amox 500"),
+            {"_id": 0, "search_terms": 0}, "amox 500", MAX_PAGE_SIZE + 1))),
+        ("get_medicines (search, next page)", "medicines", aggregate("medicines", medicine_search_pipeline(
+            medicine_list_filter(tenant, None, [], search="amox 500"),
+            {"_id": 0, "search_terms": 0}, "amox 500", MAX_PAGE_SIZE + 1, next_search_page))),
+        ("get_medicines (low_stock)", "medicines", page(
+            "medicines", medicine_list_filter(tenant, store, [store], low_stock=True))),
+        ("get_medicines (expiring_soon)", "medicines", page(
+            "medicines", medicine_list_filter(tenant, store, [store], expiring_soon=True))),
+        ("get_customers", "customers", page("customers", customer_list_filter(tenant))),
+        ("get_customers (search)", "customers", find(
+            "customers", customer_list_filter(tenant, "jane do"), limit=customer_search_page_size(None))),
+        ("get_customers (phone)", "customers", find(
+            "customers", customer_list_filter(tenant, "555-01"), limit=customer_search_page_size(None))),
+        ("get_prescriptions", "prescriptions", page(
+            "prescriptions", prescription_list_filter(tenant, [], store_id=store), direction=-1)),
+        ("get_prescriptions (customer)", "prescriptions", page(
+            "prescriptions", prescription_list_filter(tenant, [], customer_id=customer), direction=-1)),
+        ("get_prescriptions (status)", "prescriptions", page(
+            "prescriptions", prescription_list_filter(tenant, [], status=PrescriptionStatus.PENDING.value),
+            direction=-1)),
+        ("get_prescriptions (status, stores)", "prescriptions", page(
+            "prescriptions", prescription_list_filter(tenant, [store], status=PrescriptionStatus.PENDING.value),
+            direction=-1)),
+        ("attach_customer_names", "customers", find("customers", {"id": {"$in": [customer]}})),
+        ("create_sale", "medicines", update("medicines", {"id": "audit-medicine"}, stock_adjustment_update(-1))),
+        ("create_sale", "customers", update("customers", {"id": customer}, {"$inc": {"loyalty_points": 1}})),
+        ("create_sale", "sales_daily_rollups", update(
+            "sales_daily_rollups", {"tenant_id": tenant, "store_id": store, "day": "2025-01-01"},
+            {"$inc": {"transaction_count": 1}})),
+        ("create_sales_batch", "sales", find(
+            "sales", {"tenant_id": tenant, "idempotency_key": {"$in": ["audit-key"], "$type": "string"}})),
+        ("get_dashboard_stats", "customers", count("customers", {"tenant_id": tenant, "is_active": True})),
+        ("get_dashboard_stats", "sales", aggregate("sales", [
+            {"$match": {"tenant_id": tenant, "store_id": {"$in": [store]}, "created_at": {"$gte": today, "$lte": now}}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}},
+        ])),
+        ("get_dashboard_stats", "prescriptions", count(
+            "prescriptions", {"tenant_id": tenant, "store_id": {"$in": [store]}, "status": PrescriptionStatus.PENDING.value})),
+        ("get_dashboard_stats", "medicines", count(
+            "medicines", {"tenant_id": tenant, "store_id": {"$in": [store]}, "is_low_stock": True})),
+        ("get_dashboard_stats", "expiry_summaries", find("expiry_summaries", expiry_summary_filter(tenant), limit=1)),
+        ("expiring_medicines_count", "medicines", count("medicines", expiring_count_filter(tenant, [], horizon))),
+        ("expiring_medicines_count (stores)", "medicines", count(
+            "medicines", expiring_count_filter(tenant, [store], horizon))),
+        ("get_dashboard_stats", "sales", count(
+            "sales", {"tenant_id": tenant, "cashier_id": user, "created_at": {"$gte": today, "$lte": now}})),
+        ("get_notifications", "notifications", find(
+            "notifications", {"tenant_id": tenant, "user_id": user}, [("created_at", -1)], 50)),
+        ("mark_notification_read", "notifications", update(
+            "notifications", {"id": "audit-notification", "user_id": user}, {"$set": {"read": True}})),
+        ("mark_notifications_read", "notifications", update(
+            "notifications", {"user_id": user, "read": False, "created_at": {"$lte": now}}, {"$set": {"read": True}})),
+        ("get_unread_count", "notification_counters", find("notification_counters", {"user_id": user}, limit=1)),
+        ("get_sales_analytics", "sales_daily_rollups", aggregate("sales_daily_rollups", [
+            {"$match": {"tenant_id": tenant, "day": {"$gte": "2025-01-01"}}},
+            {"$group": {"_id": "$day", "total_sales": {"$sum": "$total_sales"}}},
+        ])),
+        ("get_sales_analytics", "sales_daily_medicine_rollups", aggregate("sales_daily_medicine_rollups", [
+            {"$match": {"tenant_id": tenant, "day": {"$gte": "2025-01-01"}}},
+            {"$group": {"_id": "$medicine_name", "total_quantity": {"$sum": "$total_quantity"}}},
+        ])),
+        ("ExpiryAlertScheduler", "tenants", find("tenants", {"is_active": True})),
+        ("ExpiryAlertScheduler", "users", find(
+            "users", {"tenant_id": tenant, "is_active": True, "role": {"$in": ["pharmacist"]}})),
+        ("ExpiryAlertScheduler (first run)", "medicines", find(
+            "medicines", expiry_candidate_filter(tenant, horizon))),
+        ("ExpiryAlertScheduler", "medicines", find(
+            "medicines", expiry_candidate_filter(tenant, horizon, horizon - timedelta(days=1), now - timedelta(days=1)))),
+    ]
+
+
+# Blocking sorts the route needs by design; reported as "sort" instead of failing the audit
+EXPECTED_SORTS = {
+    # _rank is computed per match, so the ranked page is a top-k sort over the index-matched set
+    "get_medicines (search)": ["SORT", "$sort"],
+    "get_medicines (search, next page)": ["SORT", "$sort"],
+}
+
+
+def plan_stages(node, in_plan=False):
+    """Stage names of every winning plan in an explain document, plus aggregation $sort stages"""
+    if isinstance(node, dict):
+        if in_plan and "stage" in node:
+            yield node["stage"]
+        if "$sort" in node and isinstance(node["$sort"], dict):
+            yield "$sort"
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            yield from plan_stages(value, in_plan or key in ("winningPlan", "queryPlan"))
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_stages(item, in_plan)
+
+
+async def audit_plans(database_name, keep):
+    database = mongo.client[database_name]
+    await create_indexes(database)
+    failures = []
+    try:
+        for route, collection, command in representative_queries():
+            explain = await database.command({"explain": command, "verbosity": "queryPlanner"})
+            stages = sorted(set(plan_stages(explain)))
+            blocking = [stage for stage in stages if stage in ("COLLSCAN", "SORT", "$sort")]
+            bad = [stage for stage in blocking if stage not in EXPECTED_SORTS.get(route, [])]
+            status = "FAIL" if bad else "sort" if blocking else "ok"
+            typer.echo(f"{status:>4}  {route:<32} {collection:<30} {', '.join(stages)}")
+            if bad:
+                failures.append(route)
+    finally:
+        if not keep:
+            await mongo.client.drop_database(database_name)
+    return failures
+
+
+@cli.command("audit-query-plans")
+def audit_query_plans(
+    database: str = typer.Option("pharmacloud_plan_audit", help="Scratch database to build indexes in"),
+    keep: bool = typer.Option(False, help="Keep the scratch database afterwards"),
+):
+    """Explain every route's query shape and fail on COLLSCAN or in-memory SORT"""
+    failures = run(audit_plans(database, keep))
+    if failures:
+        typer.echo(f"{len(failures)} query shapes are not index-backed", err=True)
+        raise typer.Exit(code=1)
+    typer.echo("All query shapes are index-backed")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,39 +1,208 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from brotli_asgi import BrotliMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, timedelta
 import jwt
 from passlib.context import CryptContext
 from enum import Enum
+import orjson
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import base64
+import codecs
+import csv
+import hashlib
+import json
+import re
+import time
+import unicodedata
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection pool; the client itself is opened per process by the app lifespan
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '0'))  # 0 = no timeout
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0'))  # 0 = wait forever
+# Comma-separated wire compressors in preference order, e.g. "zstd,snappy,zlib"
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')
+# Read routing: checkout and auth always read the primary; reporting routes (dashboard,
+# analytics) use this mode, bounded by maxStalenessSeconds (MongoDB's minimum is 90)
+REPORTING_READ_PREFERENCE = os.environ.get('REPORTING_READ_PREFERENCE', 'secondaryPreferred')
+REPORTING_MAX_STALENESS_SECONDS = int(os.environ.get('REPORTING_MAX_STALENESS_SECONDS', '90'))
+# Build indexes when a worker starts; production runs `manage.py create-indexes` once per deploy instead
+CREATE_INDEXES_ON_STARTUP = os.environ.get('CREATE_INDEXES_ON_STARTUP', 'false').lower() == 'true'
+# Refuse to start when a registered unique index (sale idempotency, notification dedup, rollups)
+# is missing; when false the worker only logs an error
+REQUIRE_UNIQUE_INDEXES = os.environ.get('REQUIRE_UNIQUE_INDEXES', 'true').lower() == 'true'
 
 # JWT Configuration
 SECRET_KEY = "pharmacy-saas-secret-key-2025"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours for SaaS
+# Opt-in: embed tenant/role/store claims so requests are authorized without a users lookup
+STATELESS_AUTH = os.environ.get('STATELESS_AUTH', 'false').lower() == 'true'
+TOKEN_VERSION_REFRESH_SECONDS = float(os.environ.get('TOKEN_VERSION_REFRESH_SECONDS', '30'))
+# Users not seen for this long drop out of the refresh set; the cache is also LRU-bounded
+TOKEN_VERSION_IDLE_SECONDS = float(os.environ.get('TOKEN_VERSION_IDLE_SECONDS', '900'))
+TOKEN_VERSION_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_VERSION_CACHE_MAX_SIZE', '50000'))
+
+# List endpoint paging
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '1000'))
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '500'))
+
+# Serialize list responses straight from Mongo documents with orjson
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', 'false').lower() == 'true'
+
+# Type-ahead search: longest indexed prefix per word
+MAX_SEARCH_PREFIX = int(os.environ.get('MAX_SEARCH_PREFIX', '20'))
+# Customer search returns one capped page of matches (no keyset cursor)
+CUSTOMER_SEARCH_LIMIT = int(os.environ.get('CUSTOMER_SEARCH_LIMIT', '50'))
+
+# Dashboard stats cache
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', '5'))
+DASHBOARD_CACHE_STALE_SECONDS = float(os.environ.get('DASHBOARD_CACHE_STALE_SECONDS', '30'))
+DASHBOARD_CACHE_MAX_SIZE = int(os.environ.get('DASHBOARD_CACHE_MAX_SIZE', '10000'))
+
+# Expiry alert scheduler
+EXPIRY_SCHEDULER_ENABLED = os.environ.get('EXPIRY_SCHEDULER_ENABLED', 'true').lower() == 'true'
+EXPIRY_SCAN_INTERVAL_SECONDS = float(os.environ.get('EXPIRY_SCAN_INTERVAL_SECONDS', '3600'))
+EXPIRY_ALERT_DAYS = int(os.environ.get('EXPIRY_ALERT_DAYS', '30'))
+EXPIRY_SCAN_BATCH_SIZE = int(os.environ.get('EXPIRY_SCAN_BATCH_SIZE', '500'))
+
+# Notification push: SSE keep-alive interval and per-connection buffer
+NOTIFICATION_STREAM_KEEPALIVE_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_KEEPALIVE_SECONDS', '15'))
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_STREAM_QUEUE_SIZE', '100'))
+# EventSource cannot send headers, so it connects with a short-lived stream-only ticket
+NOTIFICATION_STREAM_TICKET_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_TICKET_SECONDS', '60'))
+# With several workers, fan out from a Mongo change stream instead of in-process publishes
+NOTIFICATION_CHANGE_STREAM = os.environ.get('NOTIFICATION_CHANGE_STREAM', 'false').lower() == 'true'
+
+# Bulk medicine import
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))
+IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get('IMPORT_MAX_REPORTED_ERRORS', '1000'))
+
+# Responses at least this large are brotli/gzip compressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Run sale insert, inventory and loyalty writes in one transaction (requires a replica set)
+SALE_TRANSACTIONS = os.environ.get('SALE_TRANSACTIONS', 'false').lower() == 'true'
+# Most queued sales accepted by one POST /sales/batch
+SALE_BATCH_MAX_SIZE = int(os.environ.get('SALE_BATCH_MAX_SIZE', '500'))
+# Without transactions, a batch sale whose inventory/loyalty/rollup writes never finished
+# is re-applied by a retry once its claim is this old
+SALE_EFFECTS_LEASE_SECONDS = float(os.environ.get('SALE_EFFECTS_LEASE_SECONDS', '60'))
+
+# Auth lookup cache configuration
+AUTH_CACHE_MAX_SIZE = int(os.environ.get('AUTH_CACHE_MAX_SIZE', '10000'))
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_CACHE_TTL_SECONDS', '60'))
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', str(min(4, os.cpu_count() or 1))))
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+def mongo_client_options() -> Dict[str, Any]:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def reporting_read_preference():
+    mode = READ_PREFERENCE_MODES.get(REPORTING_READ_PREFERENCE)
+    if mode is None:
+        raise ValueError(f"Unknown REPORTING_READ_PREFERENCE {REPORTING_READ_PREFERENCE!r}")
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=REPORTING_MAX_STALENESS_SECONDS)
+
+class MongoConnection:
+    """Owns the process's Motor client; opened by the app lifespan or a maintenance command"""
 
-# Create the main app
-app = FastAPI(title="PharmaCloud SaaS", description="Advanced Pharmacy Management Software as a Service", version="1.0.0")
+    def __init__(self):
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.database = None
+        self.reporting_database = None
+
+    def connect(self, mongo_url: Optional[str] = None, db_name: Optional[str] = None, **overrides):
+        if self.client is None:
+            options = {**mongo_client_options(), **overrides}
+            self.client = AsyncIOMotorClient(mongo_url or os.environ['MONGO_URL'], **options)
+            db_name = db_name or os.environ['DB_NAME']
+            # Pin the default handle to the primary even if MONGO_URL sets readPreference
+            self.database = self.client.get_database(db_name, read_preference=Primary())
+            self.reporting_database = self.client.get_database(db_name, read_preference=reporting_read_preference())
+        return self.database
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.database = None
+        self.reporting_database = None
+
+class DatabaseProxy:
+    """Module-level database handle that resolves to the connected database on each access"""
+
+    def __init__(self, connection: MongoConnection, attribute: str = "database"):
+        self._connection = connection
+        self._attribute = attribute
+
+    def _database(self):
+        database = getattr(self._connection, self._attribute)
+        if database is None:
+            raise RuntimeError("MongoDB is not connected; call mongo.connect() or run inside the app lifespan")
+        return database
+
+    def __getattr__(self, name):
+        return getattr(self._database(), name)
+
+    def __getitem__(self, name):
+        return self._database()[name]
+
+mongo = MongoConnection()
+db = DatabaseProxy(mongo)
+# Dashboard and analytics reads; may be served by a secondary (see REPORTING_READ_PREFERENCE)
+reporting_db = DatabaseProxy(mongo, "reporting_database")
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -136,6 +305,15 @@ class UserCreate(BaseModel):
     license_number: Optional[str] = None
     store_ids: List[str] = []
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    role: Optional[UserRole] = None
+    phone: Optional[str] = None
+    license_number: Optional[str] = None
+    store_ids: Optional[List[str]] = None
+    permissions: Optional[List[str]] = None
+    is_active: Optional[bool] = None
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -193,6 +371,7 @@ class Medicine(BaseModel):
     side_effects: List[str] = []
     contraindications: List[str] = []
     interactions: List[str] = []
+    is_low_stock: bool = False  # Materialized quantity_in_stock <= min_stock_level
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -307,6 +486,7 @@ class Sale(BaseModel):
     loyalty_points_earned: int = 0
     loyalty_points_used: int = 0
     receipt_number: str
+    idempotency_key: Optional[str] = None  # Client-generated, for replayed offline sales
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class SaleCreate(BaseModel):
@@ -320,6 +500,13 @@ class SaleCreate(BaseModel):
     payment_reference: Optional[str] = None
     loyalty_points_used: int = 0
 
+class SaleBatchItem(SaleCreate):
+    idempotency_key: str
+    created_at: Optional[datetime] = None  # When the terminal rang the sale up, if queued offline
+
+class SaleBatchCreate(BaseModel):
+    sales: List[SaleBatchItem] = Field(..., min_length=1, max_length=SALE_BATCH_MAX_SIZE)
+
 # Supplier Management
 class Supplier(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -377,6 +564,10 @@ class Notification(BaseModel):
     read: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class NotificationMarkRead(BaseModel):
+    ids: Optional[List[str]] = None  # Mark these notifications
+    before: Optional[datetime] = None  # Mark everything created at or before this time
+
 # Token Model
 class Token(BaseModel):
     access_token: str
@@ -384,6 +575,145 @@ class Token(BaseModel):
     user: User
     tenant: Optional[Tenant] = None
 
+# Caching
+class TTLCache:
+    """Process-local LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+class StaleWhileRevalidateCache:
+    """Serves fresh values, serves stale values while one background refresh runs,
+    and collapses concurrent misses for a key into one in-flight computation"""
+
+    def __init__(self, max_size: int, ttl_seconds: float, stale_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._in_flight: Dict[Any, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _compute(self, key, compute) -> asyncio.Task:
+        task = self._in_flight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    value = await compute()
+                    self._entries[key] = (time.monotonic(), value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                    return value
+                finally:
+                    self._in_flight.pop(key, None)
+            task = asyncio.create_task(run())
+            task.add_done_callback(self._log_failure)
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+        return task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Cache refresh failed", exc_info=task.exception())
+
+    async def get_or_compute(self, key, compute):
+        if self.ttl_seconds <= 0:
+            return await compute()
+        
+        entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._compute(key, compute)
+                return value
+        
+        self.misses += 1
+        # Shield so a cancelled request does not cancel the shared computation
+        return await asyncio.shield(self._compute(key, compute))
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
+
+# Resolved identities keyed by token subject (email) and tenant id
+user_cache = TTLCache(AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS)
+tenant_cache = TTLCache(AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+dashboard_stats_cache = StaleWhileRevalidateCache(
+    DASHBOARD_CACHE_MAX_SIZE, DASHBOARD_CACHE_TTL_SECONDS, DASHBOARD_CACHE_STALE_SECONDS
+)
+
+def invalidate_user_cache(email: str):
+    """Drop a cached user after any write to its users document"""
+    user_cache.invalidate(email)
+
 # Utility functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -391,6 +721,50 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt on a dedicated bounded thread pool so it never blocks the event loop"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+
+    async def _run(self, func, *args):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def verify(self, plain_password, hashed_password):
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password):
+        return await self._run(get_password_hash, password)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.max_workers),
+            "peak_in_flight": self.peak_in_flight,
+            "completed": self.completed
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher(PASSWORD_HASH_CONCURRENCY)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -401,24 +775,213 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    credentials_exception = HTTPException(
+def build_token_claims(user: dict) -> dict:
+    """Claims for an access token; stateless mode embeds enough to rebuild the User"""
+    claims = {"sub": user["email"]}
+    if STATELESS_AUTH:
+        claims.update({
+            "uid": user["id"],
+            "name": user["name"],
+            "tenant_id": user.get("tenant_id"),
+            "role": user["role"],
+            "store_ids": user.get("store_ids", []),
+            "ver": user.get("token_version", 0)
+        })
+    return claims
+
+class TokenVersionCache:
+    """Cached (token_version, is_active) per user id, refreshed in the background for revocation.
+
+    Entries are LRU-bounded and evicted once a user has made no request for
+    idle_seconds, so each refresh only covers recently active users; an evicted
+    user is simply looked up again on their next request.
+    """
+
+    def __init__(self, refresh_seconds: float, idle_seconds: float, max_size: int):
+        self.refresh_seconds = refresh_seconds
+        self.idle_seconds = idle_seconds
+        self.max_size = max_size
+        # user_id -> (last_used, (token_version, is_active)), least recently used first
+        self._versions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, user_id: str) -> Optional[tuple]:
+        now = time.monotonic()
+        cached = self._versions.get(user_id)
+        if cached is not None:
+            entry = cached[1]
+        else:
+            user = await db.users.find_one(
+                {"id": user_id}, {"_id": 0, "token_version": 1, "is_active": 1}
+            )
+            if user is None:
+                return None
+            entry = (user.get("token_version", 0), user.get("is_active", True))
+        self._store(user_id, entry, now)
+        return entry
+
+    def set(self, user_id: str, token_version: int, is_active: bool):
+        self._store(user_id, (token_version, is_active), time.monotonic())
+
+    def _store(self, user_id: str, entry: tuple, last_used: float):
+        self._versions[user_id] = (last_used, entry)
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_size:
+            self._versions.popitem(last=False)
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._versions:
+            user_id, (last_used, _) = next(iter(self._versions.items()))
+            if last_used > cutoff:
+                break
+            del self._versions[user_id]
+
+    async def refresh(self):
+        self.evict_idle()
+        user_ids = list(self._versions)
+        if not user_ids:
+            return
+        refreshed = {}
+        async for user in db.users.find(
+            {"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "token_version": 1, "is_active": 1}
+        ):
+            refreshed[user["id"]] = (user.get("token_version", 0), user.get("is_active", True))
+        # Users that disappeared are treated as revoked; keep last_used and LRU order
+        for user_id in user_ids:
+            cached = self._versions.get(user_id)
+            if cached is not None:
+                self._versions[user_id] = (cached[0], refreshed.get(user_id, (None, False)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._versions),
+            "max_size": self.max_size,
+            "idle_seconds": self.idle_seconds,
+            "refresh_seconds": self.refresh_seconds
+        }
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Token version refresh failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+token_version_cache = TokenVersionCache(
+    TOKEN_VERSION_REFRESH_SECONDS, TOKEN_VERSION_IDLE_SECONDS, TOKEN_VERSION_CACHE_MAX_SIZE
+)
+
+async def revoke_user_tokens(user_id: str):
+    """Invalidate outstanding stateless tokens, e.g. after deactivation or a store_ids change"""
+    user = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$inc": {"token_version": 1}},
+        projection={"_id": 0, "email": 1, "token_version": 1, "is_active": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if user:
+        token_version_cache.set(user_id, user["token_version"], user.get("is_active", True))
+        invalidate_user_cache(user["email"])
+
+def credentials_error() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+STREAM_TICKET_PURPOSE = "notification_stream"
+
+def decode_token(token: str) -> dict:
+    """Verified claims of an access token or stream ticket"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.PyJWTError:
-        raise credentials_exception
+        raise credentials_error()
+    if payload.get("sub") is None:
+        raise credentials_error()
+    return payload
+
+async def authenticate_token(token: str) -> User:
+    """Resolve the User for an access token"""
+    payload = decode_token(token)
+    # Stream tickets travel in URLs and only open the notification stream
+    if "purpose" in payload:
+        raise credentials_error()
+    return await authenticate_claims(payload)
+
+async def authenticate_claims(payload: dict) -> User:
+    """Resolve the User for verified token claims, rejecting revoked or deactivated users"""
+    credentials_exception = credentials_error()
+    email: str = payload["sub"]
+    
+    if STATELESS_AUTH and "uid" in payload and "ver" in payload:
+        current = await token_version_cache.get(payload["uid"])
+        if current is None:
+            raise credentials_exception
+        token_version, is_active = current
+        if not is_active or token_version != payload["ver"]:
+            raise credentials_exception
+        return User(
+            id=payload["uid"],
+            email=email,
+            name=payload["name"],
+            role=payload["role"],
+            tenant_id=payload.get("tenant_id"),
+            store_ids=payload.get("store_ids", [])
+        )
     
-    user = await db.users.find_one({"email": email})
-    if user is None:
+    user_obj = user_cache.get(email)
+    if user_obj is None:
+        user = await db.users.find_one({"email": email})
+        if user is None:
+            raise credentials_exception
+        user_obj = User(**user)
+        user_cache.set(email, user_obj)
+    if not user_obj.is_active:
         raise credentials_exception
-    return User(**user)
+    return user_obj
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def get_stream_claims(
+    ticket: Optional[str] = Query(None, description="Stream ticket from POST /notifications/stream-ticket"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> dict:
+    """Claims for a notification stream; session_exp is when the underlying session token expires"""
+    if credentials is not None:
+        claims = decode_token(credentials.credentials)
+        if "purpose" in claims:
+            raise credentials_error()
+        return {**claims, "session_exp": claims["exp"]}
+    if ticket:
+        claims = decode_token(ticket)
+        if claims.get("purpose") != STREAM_TICKET_PURPOSE:
+            raise credentials_error()
+        return claims
+    raise credentials_error()
+
+async def stream_session_active(claims: dict) -> bool:
+    """Whether the session behind an open stream is still unexpired and unrevoked"""
+    if time.time() >= claims["session_exp"]:
+        return False
+    try:
+        await authenticate_claims(claims)
+    except HTTPException:
+        return False
+    return True
 
 async def get_current_tenant(current_user: User = Depends(get_current_user)):
     if current_user.role == UserRole.SUPER_ADMIN:
@@ -430,6 +993,10 @@ async def get_current_tenant(current_user: User = Depends(get_current_user)):
             detail="User not associated with any tenant"
         )
     
+    cached_tenant = tenant_cache.get(current_user.tenant_id)
+    if cached_tenant is not None:
+        return cached_tenant
+    
     tenant = await db.tenants.find_one({"id": current_user.tenant_id})
     if not tenant:
         raise HTTPException(
@@ -437,7 +1004,9 @@ async def get_current_tenant(current_user: User = Depends(get_current_user)):
             detail="Tenant not found"
         )
     
-    return Tenant(**tenant)
+    tenant_obj = Tenant(**tenant)
+    tenant_cache.set(tenant_obj.id, tenant_obj)
+    return tenant_obj
 
 def check_subscription_limits(tenant: Tenant, feature: str = None):
     """Check if tenant has access to specific features based on subscription"""
@@ -454,7 +1023,529 @@ def check_subscription_limits(tenant: Tenant, feature: str = None):
             detail=f"Feature '{feature}' not available in current subscription plan"
         )
 
+# Notification fan-out
+class NotificationHub:
+    """In-process pub/sub of new notifications to connected users' streams"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, set] = {}
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, notification: dict):
+        for queue in self._subscribers.get(notification["user_id"], ()):
+            try:
+                queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                # Slow client; it can catch up through GET /notifications
+                self.dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected_users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "dropped": self.dropped
+        }
+
+notification_hub = NotificationHub(NOTIFICATION_STREAM_QUEUE_SIZE)
+
+async def insert_notifications(notifications: List[dict]) -> List[dict]:
+    """Insert notifications, skipping duplicates, and push the inserted ones to live streams"""
+    if not notifications:
+        return []
+    unexpected = None
+    try:
+        await db.notifications.insert_many(notifications, ordered=False)
+        inserted = notifications
+    except BulkWriteError as exc:
+        # Duplicate dedup_keys are alerts that were already sent; anything else is a real failure,
+        # re-raised once the documents that did land are counted and published
+        write_errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in write_errors) or exc.details.get("writeConcernErrors"):
+            unexpected = exc
+        failed = {error["index"] for error in write_errors}
+        inserted = [doc for index, doc in enumerate(notifications) if index not in failed]
+    
+    unread_per_user: Dict[str, int] = {}
+    for doc in inserted:
+        if not doc.get("read"):
+            unread_per_user[doc["user_id"]] = unread_per_user.get(doc["user_id"], 0) + 1
+    if unread_per_user:
+        await db.notification_counters.bulk_write([
+            UpdateOne({"user_id": user_id}, {"$inc": {"unread": count}}, upsert=True)
+            for user_id, count in unread_per_user.items()
+        ], ordered=False)
+    
+    if not NOTIFICATION_CHANGE_STREAM:
+        for doc in inserted:
+            notification_hub.publish(doc)
+    if unexpected is not None:
+        raise unexpected
+    return inserted
+
+async def adjust_unread_count(user_id: str, delta: int):
+    """Apply a change to a user's unread counter, never going below zero"""
+    if delta:
+        await db.notification_counters.update_one(
+            {"user_id": user_id},
+            [{"$set": {"unread": {"$max": [0, {"$add": [{"$ifNull": ["$unread", 0]}, delta]}]}}}],
+            upsert=True
+        )
+
+class NotificationChangeStream:
+    """Feeds the hub from a change stream so inserts made by any worker reach every worker's clients"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def _watch(self):
+        resume_token = None
+        while True:
+            try:
+                async with db.notifications.watch(
+                    [{"$match": {"operationType": "insert"}}], resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        notification_hub.publish(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification change stream failed, reconnecting")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+notification_change_stream = NotificationChangeStream()
+
+# Batched enrichment helpers for list endpoints
+async def fetch_by_ids(collection, ids, fields: List[str]) -> Dict[str, dict]:
+    """Fetch documents for a set of ids in one $in query, projecting only `fields`"""
+    unique_ids = list({doc_id for doc_id in ids if doc_id})
+    if not unique_ids:
+        return {}
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+    docs = await collection.find({"id": {"$in": unique_ids}}, projection).to_list(len(unique_ids))
+    return {doc["id"]: doc for doc in docs}
+
+async def attach_customer_names(docs: List[dict], id_field: str = "customer_id", name_field: str = "customer_name"):
+    """Add a "First Last" customer name to each document"""
+    customers = await fetch_by_ids(db.customers, [doc.get(id_field) for doc in docs], ["first_name", "last_name"])
+    for doc in docs:
+        customer = customers.get(doc.get(id_field))
+        doc[name_field] = f"{customer['first_name']} {customer['last_name']}" if customer else "Unknown"
+    return docs
+
+async def attach_medicine_names(docs: List[dict], id_field: str = "medicine_id", name_field: str = "medicine_name"):
+    """Add the medicine name to each document (e.g. sale or order line items)"""
+    medicines = await fetch_by_ids(db.medicines, [doc.get(id_field) for doc in docs], ["name"])
+    for doc in docs:
+        medicine = medicines.get(doc.get(id_field))
+        doc[name_field] = medicine["name"] if medicine else "Unknown"
+    return docs
+
+# Keyset pagination and NDJSON streaming for list endpoints
+# Pages are ordered by (created_at, id); the next-page cursor is returned in X-Next-Cursor
+def encode_cursor(doc: dict) -> str:
+    payload = json.dumps({"created_at": doc["created_at"].isoformat(), "id": doc["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["created_at"]), payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def keyset_query(query: dict, cursor: Optional[str], direction: int) -> dict:
+    """Restrict `query` to documents after the cursor position"""
+    if not cursor:
+        return query
+    created_at, last_id = decode_cursor(cursor)
+    op = "$gt" if direction == 1 else "$lt"
+    after_cursor = {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: last_id}}
+    ]}
+    return {"$and": [query, after_cursor]}
+
+def keyset_sort(direction: int) -> list:
+    return [("created_at", direction), ("id", direction)]
+
+async def find_page(
+    collection,
+    query: dict,
+    response: Response,
+    limit: Optional[int],
+    cursor: Optional[str],
+    direction: int = 1,
+    projection: Optional[dict] = None
+) -> List[dict]:
+    """Fetch one keyset page and advertise the next cursor when more rows exist"""
+    page_size = min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+    docs = await collection.find(
+        keyset_query(query, cursor, direction), projection or {"_id": 0}
+    ).sort(keyset_sort(direction)).limit(page_size + 1).to_list(page_size + 1)
+    
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1])
+    return docs
+
+def stream_ndjson(
+    collection,
+    query: dict,
+    serialize,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    direction: int = 1,
+    projection: Optional[dict] = None,
+    enrich=None
+) -> StreamingResponse:
+    """Stream matching documents as NDJSON without materializing the result set"""
+    async def generate():
+        mongo_cursor = collection.find(
+            keyset_query(query, cursor, direction), projection or {"_id": 0}
+        ).sort(keyset_sort(direction)).batch_size(STREAM_BATCH_SIZE)
+        if limit:
+            mongo_cursor = mongo_cursor.limit(limit)
+        
+        batch = []
+        async for doc in mongo_cursor:
+            batch.append(doc)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                if enrich:
+                    await enrich(batch)
+                yield "".join(json.dumps(jsonable_encoder(serialize(item))) + "\n" for item in batch)
+                batch = []
+        if batch:
+            if enrich:
+                await enrich(batch)
+            yield "".join(json.dumps(jsonable_encoder(serialize(item))) + "\n" for item in batch)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# Collection versions and conditional GET
+# Every write bumps a per-tenant (and for medicines per-store) version counter in
+# db.collection_versions. List endpoints derive a weak ETag from the versions in
+# scope, so If-None-Match can be answered with 304 before the list query runs.
+# Weak because the compression middleware serves br, gzip and identity bodies
+# under the same tag.
+def version_keys(tenant_id: str, collection: str, store_ids: Optional[List[str]] = None) -> List[str]:
+    scopes = store_ids if store_ids else ["*"]
+    return [f"{tenant_id}:{collection}:{scope}" for scope in scopes]
+
+async def bump_versions(tenant_id: str, collection: str, store_ids: Optional[List[str]] = None, session=None):
+    """Record a write to `collection`; store-scoped writes also bump the tenant-wide version"""
+    keys = version_keys(tenant_id, collection)
+    if store_ids:
+        keys += version_keys(tenant_id, collection, store_ids)
+    await db.collection_versions.bulk_write(
+        [UpdateOne({"_id": key}, {"$inc": {"version": 1}}, upsert=True) for key in keys],
+        ordered=False,
+        session=session
+    )
+
+async def invalidate_all_versions():
+    """Bump every version, e.g. after a migration rewrites documents in place"""
+    await db.collection_versions.update_many({}, {"$inc": {"version": 1}})
+
+async def list_etag(
+    request: Request,
+    current_user: User,
+    tenant_id: str,
+    collection: str,
+    store_ids: Optional[List[str]] = None,
+    extra: Optional[List[str]] = None
+) -> str:
+    keys = version_keys(tenant_id, collection, store_ids)
+    docs = await db.collection_versions.find({"_id": {"$in": keys}}).to_list(len(keys))
+    versions = {doc["_id"]: doc["version"] for doc in docs}
+    parts = [f"{key}={versions.get(key, 0)}" for key in keys]
+    parts += [
+        request.url.path,
+        repr(sorted(request.query_params.multi_items())),
+        ",".join(sorted(current_user.store_ids)),
+        str(FAST_JSON_RESPONSES),
+        *(extra or [])
+    ]
+    return 'W/"' + hashlib.sha1("|".join(parts).encode()).hexdigest() + '"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response when the client's If-None-Match already has `etag`"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    # If-None-Match uses weak comparison
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag.removeprefix("W/") in candidates or "*" in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+# Fast list serialization
+class FastListSerializer:
+    """Serializes Mongo documents to the JSON a response_model would produce,
+    without constructing and re-validating a Pydantic object per row.
+
+    Only the model's fields are emitted, missing optional fields get their
+    defaults (legacy documents without id/created_at get a fresh value from the
+    field's default_factory, as the model would) and float fields stored as
+    integers are emitted as floats, which covers the differences between raw
+    documents and the validated models.
+    """
+
+    def __init__(self, model):
+        self.fields = list(model.model_fields)
+        self.defaults = {}
+        self.factories = {}
+        self.float_fields = set()
+        for name, field in model.model_fields.items():
+            if field.default_factory is not None:
+                self.factories[name] = field.default_factory
+            elif not field.is_required():
+                self.defaults[name] = field.default
+            if field.annotation is float or field.annotation == Optional[float]:
+                self.float_fields.add(name)
+
+    def to_dict(self, doc: dict) -> dict:
+        row = {}
+        for name in self.fields:
+            if name in doc:
+                value = doc[name]
+                if name in self.float_fields and isinstance(value, int):
+                    value = float(value)
+                row[name] = value
+            elif name in self.defaults:
+                row[name] = self.defaults[name]
+            elif name in self.factories:
+                row[name] = self.factories[name]()
+        return row
+
+    def dumps(self, docs: List[dict]) -> bytes:
+        return orjson.dumps([self.to_dict(doc) for doc in docs])
+
+def list_response(docs: List[dict], response: Optional[Response], model=None, fields: Optional[List[str]] = None):
+    """Return `docs` as model instances, or as pre-serialized JSON when FAST_JSON_RESPONSES
+    is on or a sparse fieldset was requested (which the full response_model cannot describe)"""
+    if fields is not None:
+        body = orjson.dumps([pick_fields(doc, fields) for doc in docs])
+    elif not FAST_JSON_RESPONSES:
+        return [model(**doc) for doc in docs] if model else docs
+    else:
+        body = FAST_SERIALIZERS[model].dumps(docs) if model else orjson.dumps(docs)
+    headers = {}
+    if response is not None:
+        for name in ("X-Next-Cursor", "ETag"):
+            if name in response.headers:
+                headers[name] = response.headers[name]
+    return Response(content=body, media_type="application/json", headers=headers)
+
+FAST_SERIALIZERS = {model: FastListSerializer(model) for model in (Store, Medicine, Customer, Notification)}
+
+# Sparse fieldsets
+# `fields=` on list endpoints takes a preset name or a comma-separated list of fields;
+# "full" (or omitting it) returns whole documents.
+FIELD_PRESETS: Dict[str, Dict[str, List[str]]] = {
+    "stores": {
+        "pos": ["id", "name", "tax_rate"],
+        "summary": ["id", "name", "address", "phone", "email", "tax_rate", "is_active"]
+    },
+    "medicines": {
+        "pos": ["id", "name", "strength", "selling_price", "quantity_in_stock", "barcode"],
+        "summary": ["id", "store_id", "name", "brand_name", "generic_name", "ndc_number", "category",
+                    "dosage_form", "strength", "selling_price", "quantity_in_stock", "min_stock_level",
+                    "is_low_stock", "expiry_date", "prescription_required"]
+    },
+    "customers": {
+        "pos": ["id", "first_name", "last_name", "phone", "loyalty_points"],
+        "summary": ["id", "first_name", "last_name", "phone", "email", "date_of_birth", "allergies",
+                    "loyalty_points", "total_spent", "created_at"]
+    },
+    "prescriptions": {
+        "pos": ["id", "prescription_number", "customer_id", "customer_name", "status"],
+        "summary": ["id", "store_id", "prescription_number", "customer_id", "customer_name", "doctor_name",
+                    "date_prescribed", "status", "refills_allowed", "refills_used", "days_supply", "created_at"]
+    }
+}
+
+def parse_fields(
+    fields: Optional[str], resource: str, model, computed: Optional[List[str]] = None
+) -> Optional[List[str]]:
+    """Resolve `fields=` to a field list, or None for whole documents"""
+    if not fields or fields == "full":
+        return None
+    presets = FIELD_PRESETS[resource]
+    if fields in presets:
+        return presets[fields]
+    
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in model.model_fields and name not in (computed or [])]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Presets: {', '.join([*presets, 'full'])}"
+        )
+    return selected
+
+def sparse_projection(fields: List[str], internal: Optional[List[str]] = None) -> dict:
+    """Inclusion projection for the selected fields plus the keyset paging keys"""
+    return {"_id": 0, **{name: 1 for name in [*fields, "id", "created_at", *(internal or [])]}}
+
+def pick_fields(doc: dict, fields: List[str]) -> dict:
+    return {name: doc[name] for name in fields if name in doc}
+
+# Medicine search terms
+# Medicines carry a `search_terms` array of lowercase word prefixes so type-ahead
+# queries hit the (tenant_id, search_terms) index instead of scanning with $regex,
+# plus normalized copies of the searchable fields that the ranking compares against.
+MEDICINE_SEARCH_FIELDS = ["name", "generic_name", "brand_name", "ndc_number"]
+# (normalized key, weight): a prefix match on name outranks generic, brand and NDC
+MEDICINE_RANK_KEYS = [("search_name", 8), ("search_generic_name", 4), ("search_brand_name", 2), ("search_ndc", 1)]
+MEDICINE_INTERNAL_FIELDS = ["search_terms", *(key for key, _ in MEDICINE_RANK_KEYS)]
+
+def normalize_search_text(text: Optional[str]) -> str:
+    """Casefold, strip accents and collapse punctuation to spaces"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r"[^0-9a-z]+", " ", stripped.casefold()).strip()
+
+def search_tokens(text: Optional[str]) -> List[str]:
+    return [token[:MAX_SEARCH_PREFIX] for token in normalize_search_text(text).split()]
+
+def prefixes(token: str) -> List[str]:
+    return [token[:length] for length in range(1, min(len(token), MAX_SEARCH_PREFIX) + 1)]
+
+def medicine_search_terms(medicine: dict) -> List[str]:
+    """All word prefixes of the searchable medicine fields"""
+    terms = set()
+    for field in MEDICINE_SEARCH_FIELDS:
+        for token in search_tokens(medicine.get(field)):
+            terms.update(prefixes(token))
+    # NDC codes are typed with or without dashes
+    ndc_digits = re.sub(r"\D", "", medicine.get("ndc_number") or "")
+    terms.update(prefixes(ndc_digits))
+    return sorted(terms)
+
+def medicine_rank_keys(medicine: dict) -> dict:
+    """Searchable fields normalized the same way as the search text"""
+    return {
+        "search_name": normalize_search_text(medicine.get("name")),
+        "search_generic_name": normalize_search_text(medicine.get("generic_name")),
+        "search_brand_name": normalize_search_text(medicine.get("brand_name")),
+        "search_ndc": re.sub(r"\D", "", medicine.get("ndc_number") or ""),
+    }
+
+def medicine_search_filter(search: str) -> dict:
+    tokens = search_tokens(search)
+    if not tokens:
+        # Nothing searchable (e.g. only punctuation): match nothing rather than everything
+        return {"search_terms": {"$in": []}}
+    return {"search_terms": {"$all": tokens}}
+
+def medicine_search_rank(search: str) -> dict:
+    """Score a match by which field the search text prefixes: name > generic > brand > NDC"""
+    needle = normalize_search_text(search)
+    needles = {"search_ndc": needle.replace(" ", "")}
+    return {"$add": [
+        {"$cond": [
+            {"$regexMatch": {
+                "input": {"$ifNull": [f"${key}", ""]},
+                "regex": "^" + re.escape(needles.get(key, needle))
+            }},
+            weight,
+            0
+        ]}
+        for key, weight in MEDICINE_RANK_KEYS
+    ]}
+
+# Customer search keys
+# Normalized copies of the fields counter staff search by, each backed by a
+# (tenant_id, key) index so anchored prefix regexes become index range scans.
+CUSTOMER_SEARCH_KEYS = ["search_first_name", "search_last_name", "search_phone", "search_email"]
+# Longest name query split into first/last name pairs (each split point is two $or clauses)
+MAX_CUSTOMER_NAME_TOKENS = 6
+APOSTROPHES = re.compile(r"['`\u2019\u02bc]")
+
+def normalize_customer_name(text: Optional[str]) -> str:
+    """Normalized name with apostrophes dropped, so O'Brien, O\u2019Brien and OBrien all read "obrien" """
+    return normalize_search_text(APOSTROPHES.sub("", text or ""))
+
+def customer_search_keys(customer: dict) -> dict:
+    return {
+        "search_first_name": normalize_customer_name(customer.get("first_name")),
+        "search_last_name": normalize_customer_name(customer.get("last_name")),
+        "search_phone": re.sub(r"\D", "", customer.get("phone") or ""),
+        "search_email": (customer.get("email") or "").strip().lower()
+    }
+
+def prefix_match(value: str) -> dict:
+    return {"$regex": f"^{re.escape(value)}"}
+
+def customer_search_filter(search: str) -> dict:
+    """Anchored prefix matches on the normalized customer keys"""
+    clauses = []
+    name = normalize_customer_name(search)
+    if name:
+        # The whole query within one name: "van dyke", "mary ann"
+        clauses.append({"search_first_name": prefix_match(name)})
+        clauses.append({"search_last_name": prefix_match(name)})
+    tokens = name.split()[:MAX_CUSTOMER_NAME_TOKENS]
+    for split in range(1, len(tokens)):
+        # First name then last name or the reverse, at every split: "john smi", "mary ann smith", "smith jo"
+        head, tail = " ".join(tokens[:split]), " ".join(tokens[split:])
+        clauses.append({"search_first_name": prefix_match(head), "search_last_name": prefix_match(tail)})
+        clauses.append({"search_last_name": prefix_match(head), "search_first_name": prefix_match(tail)})
+    
+    digits = re.sub(r"\D", "", search)
+    if digits and len(digits) >= len(re.sub(r"\s", "", search)) / 2:
+        clauses.append({"search_phone": prefix_match(digits)})
+    
+    email = search.strip().lower()
+    if email and not re.search(r"\s", email):
+        clauses.append({"search_email": prefix_match(email)})
+    
+    if not clauses:
+        return {}
+    return {"$or": clauses}
+
 # Authentication Routes
+# Subscription features and store limits by plan
+PLAN_FEATURES = {
+    SubscriptionPlan.STARTER: ["basic_inventory", "basic_sales", "single_store"],
+    SubscriptionPlan.PROFESSIONAL: ["advanced_inventory", "multi_store", "reporting", "integrations"],
+    SubscriptionPlan.ENTERPRISE: ["all_features", "unlimited_stores", "api_access", "white_label"]
+}
+
+PLAN_MAX_STORES = {
+    SubscriptionPlan.STARTER: 1,
+    SubscriptionPlan.PROFESSIONAL: 3,
+    SubscriptionPlan.ENTERPRISE: 999
+}
+
 @api_router.post("/auth/register-tenant", response_model=Token)
 async def register_tenant(tenant_data: TenantCreate):
     """Register a new pharmacy tenant"""
@@ -466,24 +1557,11 @@ async def register_tenant(tenant_data: TenantCreate):
             detail="Subdomain already taken"
         )
     
-    # Set subscription features based on plan
-    features_map = {
-        SubscriptionPlan.STARTER: ["basic_inventory", "basic_sales", "single_store"],
-        SubscriptionPlan.PROFESSIONAL: ["advanced_inventory", "multi_store", "reporting", "integrations"],
-        SubscriptionPlan.ENTERPRISE: ["all_features", "unlimited_stores", "api_access", "white_label"]
-    }
-    
-    max_stores_map = {
-        SubscriptionPlan.STARTER: 1,
-        SubscriptionPlan.PROFESSIONAL: 3,
-        SubscriptionPlan.ENTERPRISE: 999
-    }
-    
     # Create tenant
     tenant_dict = tenant_data.dict()
     tenant_dict["subscription_expires_at"] = datetime.utcnow() + timedelta(days=14)  # 14-day trial
-    tenant_dict["max_stores"] = max_stores_map[tenant_data.subscription_plan]
-    tenant_dict["features_enabled"] = features_map[tenant_data.subscription_plan]
+    tenant_dict["max_stores"] = PLAN_MAX_STORES[tenant_data.subscription_plan]
+    tenant_dict["features_enabled"] = PLAN_FEATURES[tenant_data.subscription_plan]
     
     tenant_obj = Tenant(**tenant_dict)
     await db.tenants.insert_one(tenant_obj.dict())
@@ -504,6 +1582,8 @@ async def register_user(user_data: UserCreate, current_user: User = Depends(get_
             detail="Insufficient permissions to register new users"
         )
     
+    check_role_grant(current_user, user_data.role)
+    
     # Check if email already exists
     existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
@@ -513,7 +1593,7 @@ async def register_user(user_data: UserCreate, current_user: User = Depends(get_
         )
     
     # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user_dict = user_data.dict()
     del user_dict["password"]
     
@@ -526,10 +1606,96 @@ async def register_user(user_data: UserCreate, current_user: User = Depends(get_
     # Store user with hashed password
     user_doc = user_obj.dict()
     user_doc["hashed_password"] = hashed_password
+    user_doc["token_version"] = 0
     await db.users.insert_one(user_doc)
+    invalidate_user_cache(user_obj.email)
     
     return {"message": "User registered successfully", "user_id": user_obj.id}
 
+# Fields embedded in stateless tokens (or gating them); changing any revokes outstanding tokens
+TOKEN_CLAIM_FIELDS = {"name", "role", "store_ids", "is_active"}
+
+# Higher ranks manage lower ones; nobody manages a user at or above their own rank
+ROLE_RANK = {
+    UserRole.SUPER_ADMIN: 6,
+    UserRole.PHARMACY_OWNER: 5,
+    UserRole.PHARMACY_MANAGER: 4,
+    UserRole.PHARMACIST: 3,
+    UserRole.PHARMACY_TECHNICIAN: 2,
+    UserRole.CASHIER: 1,
+    UserRole.CUSTOMER: 0,
+}
+
+def check_role_grant(current_user: User, role: UserRole):
+    """Only roles below the caller's own may be granted; only a super admin grants super admin"""
+    if current_user.role == UserRole.SUPER_ADMIN:
+        return
+    if ROLE_RANK[UserRole(role)] >= ROLE_RANK[current_user.role]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot grant a role at or above your own"
+        )
+
+def check_user_management(current_user: User, target_role: UserRole, new_role: Optional[UserRole] = None):
+    """Raise unless the caller outranks the target user (and any role being granted)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.PHARMACY_OWNER, UserRole.PHARMACY_MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to manage users"
+        )
+    if ROLE_RANK[UserRole(target_role)] >= ROLE_RANK[current_user.role]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot manage a user at or above your own role"
+        )
+    if new_role is not None:
+        check_role_grant(current_user, new_role)
+
+async def update_user_document(user_id: str, changes: dict, current_user: User) -> User:
+    """Apply changes to a user the caller may manage, revoking tokens when their claims change"""
+    query = {"id": user_id}
+    if current_user.role != UserRole.SUPER_ADMIN:
+        query["tenant_id"] = current_user.tenant_id
+    
+    target = await db.users.find_one(query, {"_id": 0, "role": 1})
+    if target is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    check_user_management(current_user, target["role"], changes.get("role"))
+    
+    # Matching the checked role means a concurrent promotion cannot slip past the check
+    result = await db.users.update_one({**query, "role": target["role"]}, {"$set": changes})
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User changed concurrently; retry"
+        )
+    user = await db.users.find_one(query, {"_id": 0, "hashed_password": 0})
+    
+    if TOKEN_CLAIM_FIELDS & changes.keys():
+        await revoke_user_tokens(user_id)
+    else:
+        invalidate_user_cache(user["email"])
+    return User(**user)
+
+@api_router.put("/users/{user_id}", response_model=User)
+async def update_user(user_id: str, user_data: UserUpdate, current_user: User = Depends(get_current_user)):
+    """Update a user's profile, role, store access or active flag"""
+    changes = {key: value for key, value in user_data.dict().items() if value is not None}
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No changes supplied"
+        )
+    return await update_user_document(user_id, changes, current_user)
+
+@api_router.post("/users/{user_id}/deactivate", response_model=User)
+async def deactivate_user(user_id: str, current_user: User = Depends(get_current_user)):
+    """Deactivate a user and revoke their outstanding tokens"""
+    return await update_user_document(user_id, {"is_active": False}, current_user)
+
 @api_router.post("/auth/login", response_model=Token)
 async def login_user(credentials: UserLogin):
     """Login user with optional tenant subdomain"""
@@ -546,7 +1712,7 @@ async def login_user(credentials: UserLogin):
         query["tenant_id"] = tenant["id"]
     
     user = await db.users.find_one(query)
-    if not user or not verify_password(credentials.password, user["hashed_password"]):
+    if not user or not await password_hasher.verify(credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -557,10 +1723,11 @@ async def login_user(credentials: UserLogin):
         {"id": user["id"]},
         {"$set": {"last_login": datetime.utcnow()}}
     )
+    invalidate_user_cache(user["email"])
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]}, expires_delta=access_token_expires
+        data=build_token_claims(user), expires_delta=access_token_expires
     )
     
     user_obj = User(**user)
@@ -578,6 +1745,34 @@ async def login_user(credentials: UserLogin):
         "tenant": tenant_obj
     }
 
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get hit/miss counters for the auth lookup and dashboard caches, and live notification streams"""
+    if current_user.role != UserRole.SUPER_ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    
+    return {
+        "users": user_cache.stats(),
+        "tenants": tenant_cache.stats(),
+        "token_versions": token_version_cache.stats(),
+        "dashboard_stats": dashboard_stats_cache.stats(),
+        "notification_streams": notification_hub.stats()
+    }
+
+@api_router.get("/admin/password-hashing-stats")
+async def get_password_hashing_stats(current_user: User = Depends(get_current_user)):
+    """Get concurrency and queue-depth metrics for the bcrypt executor"""
+    if current_user.role != UserRole.SUPER_ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    
+    return password_hasher.stats()
+
 # Store Management Routes
 @api_router.post("/stores", response_model=Store)
 async def create_store(
@@ -607,32 +1802,37 @@ async def create_store(
     store_obj = Store(**store_dict)
     
     await db.stores.insert_one(store_obj.dict())
+    await bump_versions(tenant.id, "stores")
     return store_obj
 
 @api_router.get("/stores", response_model=List[Store])
 async def get_stores(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="pos, summary, full or a comma-separated field list"),
     current_user: User = Depends(get_current_user),
     tenant: Tenant = Depends(get_current_tenant)
 ):
     """Get all stores for tenant"""
+    selected = parse_fields(fields, "stores", Store)
     query = {"tenant_id": tenant.id, "is_active": True}
     
     # If user has limited store access, filter by store_ids
     if current_user.store_ids:
         query["id"] = {"$in": current_user.store_ids}
     
-    stores = await db.stores.find(query).to_list(100)
-    return [Store(**store) for store in stores]
+    etag = await list_etag(request, current_user, tenant.id, "stores")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+    
+    projection = sparse_projection(selected) if selected else {"_id": 0}
+    stores = await db.stores.find(query, projection).to_list(100)
+    return list_response(stores, response, Store, selected)
 
 # Medicine/Inventory Routes
-@api_router.post("/medicines", response_model=Medicine)
-async def create_medicine(
-    medicine_data: MedicineCreate,
-    store_id: str,
-    current_user: User = Depends(get_current_user),
-    tenant: Tenant = Depends(get_current_tenant)
-):
-    """Add new medicine to inventory"""
+def check_medicine_write_access(current_user: User, tenant: Tenant, store_id: str):
     check_subscription_limits(tenant, "basic_inventory")
     
     if current_user.role not in [UserRole.PHARMACIST, UserRole.PHARMACY_MANAGER, UserRole.PHARMACY_OWNER]:
@@ -647,66 +1847,304 @@ async def create_medicine(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No access to this store"
         )
-    
+
+def build_medicine_doc(medicine_data: MedicineCreate, tenant_id: str, store_id: str) -> dict:
+    """Medicine document with its derived search and low-stock fields"""
     medicine_dict = medicine_data.dict()
-    medicine_dict["tenant_id"] = tenant.id
+    medicine_dict["tenant_id"] = tenant_id
     medicine_dict["store_id"] = store_id
-    medicine_obj = Medicine(**medicine_dict)
+    medicine_dict["is_low_stock"] = medicine_data.quantity_in_stock <= medicine_data.min_stock_level
+    medicine_doc = Medicine(**medicine_dict).dict()
+    medicine_doc["search_terms"] = medicine_search_terms(medicine_doc)
+    medicine_doc.update(medicine_rank_keys(medicine_doc))
+    return medicine_doc
+
+def low_stock_notification(tenant_id: str, user_id: str, medicine: dict) -> dict:
+    return Notification(
+        tenant_id=tenant_id,
+        user_id=user_id,
+        type=NotificationType.LOW_STOCK,
+        title="Low Stock Alert",
+        message=f"{medicine['name']} is running low in stock",
+        data={"medicine_id": medicine["id"], "current_stock": medicine["quantity_in_stock"]}
+    ).dict()
+
+@api_router.post("/medicines", response_model=Medicine)
+async def create_medicine(
+    medicine_data: MedicineCreate,
+    store_id: str,
+    current_user: User = Depends(get_current_user),
+    tenant: Tenant = Depends(get_current_tenant)
+):
+    """Add new medicine to inventory"""
+    check_medicine_write_access(current_user, tenant, store_id)
     
-    await db.medicines.insert_one(medicine_obj.dict())
+    medicine_doc = build_medicine_doc(medicine_data, tenant.id, store_id)
+    await db.medicines.insert_one(medicine_doc)
+    await bump_versions(tenant.id, "medicines", [store_id])
+    medicine_obj = Medicine(**medicine_doc)
     
     # Check for low stock and create notification
-    if medicine_obj.quantity_in_stock <= medicine_obj.min_stock_level:
-        notification = Notification(
-            tenant_id=tenant.id,
-            user_id=current_user.id,
-            type=NotificationType.LOW_STOCK,
-            title="Low Stock Alert",
-            message=f"{medicine_obj.name} is running low in stock",
-            data={"medicine_id": medicine_obj.id, "current_stock": medicine_obj.quantity_in_stock}
-        )
-        await db.notifications.insert_one(notification.dict())
+    if medicine_obj.is_low_stock:
+        await insert_notifications([low_stock_notification(tenant.id, current_user.id, medicine_doc)])
     
     return medicine_obj
 
-@api_router.get("/medicines", response_model=List[Medicine])
-async def get_medicines(
-    store_id: Optional[str] = Query(None),
-    category: Optional[str] = Query(None),
-    low_stock: Optional[bool] = Query(None),
-    expiring_soon: Optional[bool] = Query(None),
-    search: Optional[str] = Query(None),
+MEDICINE_LIST_FIELDS = ["side_effects", "contraindications", "interactions"]
+
+async def upload_lines(request: Request):
+    """Decode the request body line by line without buffering the whole upload"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+async def upload_rows(request: Request, upload_format: str):
+    """Yield (row_number, raw_dict or parse error) from a CSV or NDJSON upload"""
+    header = None
+    row_number = 0
+    async for line in upload_lines(request):
+        if not line.strip():
+            continue
+        if upload_format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            row = {}
+            for name, value in zip(header, values):
+                if value == "":
+                    continue
+                row[name] = [item.strip() for item in value.split(";") if item.strip()] \
+                    if name in MEDICINE_LIST_FIELDS else value
+            yield row_number, row
+        else:
+            row_number += 1
+            try:
+                yield row_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield row_number, exc
+
+@api_router.post("/medicines/import")
+async def import_medicines(
+    request: Request,
+    store_id: str,
+    upload_format: str = Query("ndjson", alias="format", pattern="^(csv|ndjson)$",
+                               description="csv (with header row) or ndjson"),
     current_user: User = Depends(get_current_user),
     tenant: Tenant = Depends(get_current_tenant)
 ):
-    """Get medicines with filtering options"""
-    query = {"tenant_id": tenant.id}
+    """Bulk import medicines from a streamed CSV or NDJSON body.
+
+    Rows are validated and inserted in chunks of IMPORT_CHUNK_SIZE with unordered
+    insert_many; invalid rows are reported and skipped. CSV list fields are
+    ';'-separated, and quoted values must not contain newlines.
+    """
+    check_medicine_write_access(current_user, tenant, store_id)
+    
+    started = time.perf_counter()
+    summary = {"rows": 0, "inserted": 0, "failed": 0, "errors": []}
+    low_stock = []
+    
+    def record_error(row_number, errors):
+        summary["failed"] += 1
+        if len(summary["errors"]) < IMPORT_MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": row_number, "errors": errors})
+    
+    async def flush(chunk):
+        docs = [doc for _, doc in chunk]
+        try:
+            await db.medicines.insert_many(docs, ordered=False)
+            inserted_indexes = range(len(chunk))
+        except BulkWriteError as exc:
+            failed = {}
+            for error in exc.details.get("writeErrors", []):
+                failed[error["index"]] = error["errmsg"]
+            for index, message in failed.items():
+                record_error(chunk[index][0], [{"msg": message}])
+            inserted_indexes = [index for index in range(len(chunk)) if index not in failed]
+        for index in inserted_indexes:
+            doc = chunk[index][1]
+            summary["inserted"] += 1
+            if doc["is_low_stock"]:
+                low_stock.append({key: doc[key] for key in ("id", "name", "quantity_in_stock")})
+    
+    chunk = []
+    async for row_number, row in upload_rows(request, upload_format):
+        summary["rows"] += 1
+        if isinstance(row, Exception):
+            record_error(row_number, [{"msg": str(row)}])
+            continue
+        if not isinstance(row, dict):
+            record_error(row_number, [{"msg": f"Expected a JSON object, got {type(row).__name__}"}])
+            continue
+        try:
+            chunk.append((row_number, build_medicine_doc(MedicineCreate(**row), tenant.id, store_id)))
+        except ValidationError as exc:
+            record_error(row_number, [{"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors()])
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    if summary["inserted"]:
+        await bump_versions(tenant.id, "medicines", [store_id])
+    
+    # Low-stock notifications for the whole import
+    for start in range(0, len(low_stock), IMPORT_CHUNK_SIZE):
+        await insert_notifications([
+            low_stock_notification(tenant.id, current_user.id, medicine)
+            for medicine in low_stock[start:start + IMPORT_CHUNK_SIZE]
+        ])
+    
+    elapsed = time.perf_counter() - started
+    summary["low_stock_notifications"] = len(low_stock)
+    summary["elapsed_seconds"] = round(elapsed, 3)
+    summary["rows_per_second"] = round(summary["rows"] / elapsed, 1) if elapsed else None
+    return summary
+
+def medicine_list_filter(
+    tenant_id: str,
+    store_id: Optional[str],
+    store_ids: List[str],
+    category: Optional[str] = None,
+    low_stock: Optional[bool] = None,
+    expiring_soon: Optional[bool] = None,
+    search: Optional[str] = None
+) -> dict:
+    """Filter for GET /medicines (shared with manage.py audit-query-plans)"""
+    query = {"tenant_id": tenant_id}
     
     if store_id:
         query["store_id"] = store_id
-    elif current_user.store_ids:
-        query["store_id"] = {"$in": current_user.store_ids}
+    elif store_ids:
+        query["store_id"] = {"$in": store_ids}
     
     if category:
         query["category"] = category
     
     if low_stock:
-        query["$expr"] = {"$lte": ["$quantity_in_stock", "$min_stock_level"]}
+        query["is_low_stock"] = True
     
     if expiring_soon:
         thirty_days_ahead = datetime.utcnow() + timedelta(days=30)
         query["expiry_date"] = {"$lte": thirty_days_ahead}
     
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"generic_name": {"$regex": search, "$options": "i"}},
-            {"brand_name": {"$regex": search, "$options": "i"}},
-            {"ndc_number": {"$regex": search, "$options": "i"}}
-        ]
+        query.update(medicine_search_filter(search))
+    return query
+
+# Ranked search pages are ordered by (_rank desc, name, id); their cursor carries all three
+def encode_rank_cursor(doc: dict) -> str:
+    payload = json.dumps({"rank": doc["_rank"], "name": doc["name"], "id": doc["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_rank_cursor(cursor: str) -> tuple:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return payload["rank"], payload["name"], payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def medicine_search_pipeline(
+    query: dict, projection: dict, search: str, limit: int, cursor: Optional[str] = None
+) -> List[dict]:
+    """Ranked type-ahead aggregation, best prefix matches first"""
+    pipeline = [
+        {"$match": query},
+        {"$project": projection},
+        {"$addFields": {"_rank": medicine_search_rank(search)}}
+    ]
+    if cursor:
+        rank, name, last_id = decode_rank_cursor(cursor)
+        pipeline.append({"$match": {"$or": [
+            {"_rank": {"$lt": rank}},
+            {"_rank": rank, "name": {"$gt": name}},
+            {"_rank": rank, "name": name, "id": {"$gt": last_id}}
+        ]}})
+    return pipeline + [
+        {"$sort": {"_rank": -1, "name": 1, "id": 1}},
+        {"$limit": limit},
+        {"$project": {key: 0 for key, _ in MEDICINE_RANK_KEYS}}
+    ]
+
+@api_router.get("/medicines", response_model=List[Medicine])
+async def get_medicines(
+    request: Request,
+    response: Response,
+    store_id: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    low_stock: Optional[bool] = Query(None),
+    expiring_soon: Optional[bool] = Query(None),
+    search: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (max MAX_PAGE_SIZE)"),
+    cursor: Optional[str] = Query(None, description="Value of a previous X-Next-Cursor header"),
+    stream: bool = Query(False, description="Stream all matches as NDJSON"),
+    fields: Optional[str] = Query(None, description="pos, summary, full or a comma-separated field list"),
+    current_user: User = Depends(get_current_user),
+    tenant: Tenant = Depends(get_current_tenant)
+):
+    """Get medicines with filtering options"""
+    if search and not search_tokens(search):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Search must contain at least one letter or digit"
+        )
+    selected = parse_fields(fields, "medicines", Medicine)
+    query = medicine_list_filter(
+        tenant.id, store_id, current_user.store_ids, category, low_stock, expiring_soon, search
+    )
+    
+    if not stream:
+        # expiring_soon results move with the clock, not only with writes
+        extra = [datetime.utcnow().strftime("%Y-%m-%d")] if expiring_soon else []
+        etag = await list_etag(
+            request, current_user, tenant.id, "medicines",
+            [store_id] if store_id else current_user.store_ids, extra
+        )
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        response.headers["ETag"] = etag
+    
+    if selected:
+        # name and the normalized rank keys feed the search ordering
+        ranked = ["name", *(key for key, _ in MEDICINE_RANK_KEYS)] if search and not stream else []
+        projection = sparse_projection(selected, ranked)
+        serialize = lambda med: pick_fields(med, selected)
+    elif search and not stream:
+        projection = {"_id": 0, "search_terms": 0}
+        serialize = lambda med: Medicine(**med)
+    else:
+        projection = {"_id": 0, **{name: 0 for name in MEDICINE_INTERNAL_FIELDS}}
+        serialize = lambda med: Medicine(**med)
     
-    medicines = await db.medicines.find(query).to_list(1000)
-    return [Medicine(**med) for med in medicines]
+    if stream:
+        return stream_ndjson(db.medicines, query, serialize, limit, cursor, projection=projection)
+    
+    if search:
+        # Ranked type-ahead results, best prefix matches first; X-Next-Cursor continues the ranking
+        page_size = min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        pipeline = medicine_search_pipeline(query, projection, search, page_size + 1, cursor)
+        medicines = await db.medicines.aggregate(pipeline).to_list(page_size + 1)
+        if len(medicines) > page_size:
+            medicines = medicines[:page_size]
+            response.headers["X-Next-Cursor"] = encode_rank_cursor(medicines[-1])
+        return list_response(medicines, response, Medicine, selected)
+    
+    medicines = await find_page(db.medicines, query, response, limit, cursor, projection=projection)
+    return list_response(medicines, response, Medicine, selected)
 
 # Customer Management Routes
 @api_router.post("/customers", response_model=Customer)
@@ -720,28 +2158,73 @@ async def create_customer(
     customer_dict["tenant_id"] = tenant.id
     customer_obj = Customer(**customer_dict)
     
-    await db.customers.insert_one(customer_obj.dict())
+    customer_doc = customer_obj.dict()
+    customer_doc.update(customer_search_keys(customer_doc))
+    await db.customers.insert_one(customer_doc)
+    await bump_versions(tenant.id, "customers")
     return customer_obj
 
+def customer_list_filter(tenant_id: str, search: Optional[str] = None) -> dict:
+    """Filter for GET /customers (shared with manage.py audit-query-plans)"""
+    query = {"tenant_id": tenant_id, "is_active": True}
+    if search:
+        query.update(customer_search_filter(search))
+    return query
+
+def customer_search_page_size(limit: Optional[int]) -> int:
+    return min(limit or CUSTOMER_SEARCH_LIMIT, MAX_PAGE_SIZE)
+
 @api_router.get("/customers", response_model=List[Customer])
 async def get_customers(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (max MAX_PAGE_SIZE)"),
+    cursor: Optional[str] = Query(None, description="Value of a previous X-Next-Cursor header"),
+    stream: bool = Query(False, description="Stream all matches as NDJSON"),
+    fields: Optional[str] = Query(None, description="pos, summary, full or a comma-separated field list"),
     current_user: User = Depends(get_current_user),
     tenant: Tenant = Depends(get_current_tenant)
 ):
     """Get customers with search"""
-    query = {"tenant_id": tenant.id, "is_active": True}
+    selected = parse_fields(fields, "customers", Customer)
+    query = customer_list_filter(tenant.id, search)
+    
+    if not stream:
+        etag = await list_etag(request, current_user, tenant.id, "customers")
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        response.headers["ETag"] = etag
+    
+    if selected:
+        projection = sparse_projection(selected)
+        serialize = lambda customer: pick_fields(customer, selected)
+    else:
+        projection = {"_id": 0, **{key: 0 for key in CUSTOMER_SEARCH_KEYS}}
+        serialize = lambda customer: Customer(**customer)
     
-    if search:
-        query["$or"] = [
-            {"first_name": {"$regex": search, "$options": "i"}},
-            {"last_name": {"$regex": search, "$options": "i"}},
-            {"phone": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}}
-        ]
+    if stream:
+        return stream_ndjson(db.customers, query, serialize, limit, cursor, projection=projection)
     
-    customers = await db.customers.find(query).to_list(1000)
-    return [Customer(**customer) for customer in customers]
+    if search:
+        # A (created_at, id) sort over the $or of prefix scans would need a blocking
+        # SORT, so take a capped batch straight off the indexes and order it here
+        page_size = customer_search_page_size(limit)
+        sort_keys = ["search_last_name", "search_first_name"]
+        if selected:
+            projection = sparse_projection(selected, sort_keys)
+        else:
+            projection = {key: value for key, value in projection.items() if key not in sort_keys}
+        customers = await db.customers.find(query, projection).limit(page_size).to_list(page_size)
+        customers.sort(key=lambda customer: tuple(customer.get(key) or "" for key in sort_keys))
+        for customer in customers:
+            for key in sort_keys:
+                customer.pop(key, None)
+        return list_response(customers, response, Customer, selected)
+    
+    customers = await find_page(db.customers, query, response, limit, cursor, projection=projection)
+    return list_response(customers, response, Customer, selected)
 
 # Prescription Management Routes
 @api_router.post("/prescriptions", response_model=Prescription)
@@ -768,55 +2251,180 @@ async def create_prescription(
     
     return prescription_obj
 
+def prescription_list_filter(
+    tenant_id: str,
+    store_ids: List[str],
+    status: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    store_id: Optional[str] = None
+) -> dict:
+    """Filter for GET /prescriptions (shared with manage.py audit-query-plans)"""
+    query = {"tenant_id": tenant_id}
+    if status:
+        query["status"] = status
+    if customer_id:
+        query["customer_id"] = customer_id
+    if store_id:
+        query["store_id"] = store_id
+    elif store_ids:
+        query["store_id"] = {"$in": store_ids}
+    return query
+
 @api_router.get("/prescriptions", response_model=List[dict])
 async def get_prescriptions(
+    response: Response,
     status: Optional[str] = Query(None),
     customer_id: Optional[str] = Query(None),
     store_id: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (max MAX_PAGE_SIZE)"),
+    cursor: Optional[str] = Query(None, description="Value of a previous X-Next-Cursor header"),
+    stream: bool = Query(False, description="Stream all matches as NDJSON"),
+    fields: Optional[str] = Query(None, description="pos, summary, full or a comma-separated field list"),
     current_user: User = Depends(get_current_user),
     tenant: Tenant = Depends(get_current_tenant)
 ):
     """Get prescriptions with filtering"""
-    query = {"tenant_id": tenant.id}
+    selected = parse_fields(fields, "prescriptions", Prescription, computed=["customer_name"])
+    query = prescription_list_filter(tenant.id, current_user.store_ids, status, customer_id, store_id)
+    
+    # Only look up customer names when they will be returned
+    enrich = attach_customer_names if not selected or "customer_name" in selected else None
+    if selected:
+        projection = sparse_projection([name for name in selected if name != "customer_name"], ["customer_id"])
+        serialize = lambda prescription: pick_fields(prescription, selected)
+    else:
+        projection = None
+        serialize = lambda prescription: prescription
     
-    if status:
-        query["status"] = status
-    if customer_id:
-        query["customer_id"] = customer_id
-    if store_id:
-        query["store_id"] = store_id
-    elif current_user.store_ids:
-        query["store_id"] = {"$in": current_user.store_ids}
+    if stream:
+        return stream_ndjson(
+            db.prescriptions, query, serialize, limit, cursor,
+            direction=-1, projection=projection, enrich=enrich
+        )
     
-    prescriptions = await db.prescriptions.find(query).sort("created_at", -1).to_list(1000)
+    prescriptions = await find_page(db.prescriptions, query, response, limit, cursor, direction=-1, projection=projection)
     
     # Enrich with customer info
-    result = []
-    for prescription in prescriptions:
-        customer = await db.customers.find_one({"id": prescription["customer_id"]})
-        prescription_info = {
-            **prescription,
-            "customer_name": f"{customer['first_name']} {customer['last_name']}" if customer else "Unknown"
-        }
-        result.append(prescription_info)
-    
-    return result
+    if enrich:
+        await enrich(prescriptions)
+    return list_response(prescriptions, response, fields=selected)
 
 # Sales/POS Routes
-@api_router.post("/sales", response_model=Sale)
-async def create_sale(
-    sale_data: SaleCreate,
-    store_id: str,
-    current_user: User = Depends(get_current_user),
-    tenant: Tenant = Depends(get_current_tenant)
-):
-    """Process a sale/transaction"""
+LOW_STOCK_FLAG_STAGE = {"$set": {"is_low_stock": {"$lte": ["$quantity_in_stock", "$min_stock_level"]}}}
+
+def stock_adjustment_update(delta: int) -> list:
+    """Pipeline update that changes stock by `delta` and keeps is_low_stock in sync.
+    Every stock-changing path (sales, receiving, adjustments) should use this."""
+    return [
+        {"$set": {
+            "quantity_in_stock": {"$add": ["$quantity_in_stock", delta]},
+            "updated_at": datetime.utcnow()
+        }},
+        LOW_STOCK_FLAG_STAGE
+    ]
+
+def inventory_decrement_ops(items: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """One stock decrement per line item, for a single ordered bulk_write"""
+    return [
+        UpdateOne({"id": item["medicine_id"]}, stock_adjustment_update(-item["quantity"]))
+        for item in items
+    ]
+
+def sale_day(created_at: datetime) -> str:
+    """Rollup bucket for a sale, matching $dateToString "%Y-%m-%d" on created_at"""
+    return created_at.strftime("%Y-%m-%d")
+
+def sales_rollup_ops(sales: List[Sale]) -> tuple:
+    """$inc upserts for the daily store and per-medicine rollups of `sales`"""
+    daily: Dict[tuple, Dict[str, float]] = {}
+    per_medicine: Dict[tuple, Dict[str, Any]] = {}
+    for sale in sales:
+        day_key = (sale.tenant_id, sale.store_id, sale_day(sale.created_at))
+        totals = daily.setdefault(day_key, {"total_sales": 0.0, "transaction_count": 0})
+        totals["total_sales"] += sale.total_amount
+        totals["transaction_count"] += 1
+        for item in sale.items:
+            medicine_key = (*day_key, item.get("medicine_id"))
+            medicine_totals = per_medicine.setdefault(
+                medicine_key,
+                {"medicine_name": item.get("medicine_name"), "total_quantity": 0, "total_revenue": 0.0}
+            )
+            medicine_totals["total_quantity"] += item["quantity"]
+            medicine_totals["total_revenue"] += item["price"] * item["quantity"]
+    
+    daily_ops = [
+        UpdateOne(
+            {"tenant_id": tenant_id, "store_id": store_id, "day": day},
+            {"$inc": totals},
+            upsert=True
+        )
+        for (tenant_id, store_id, day), totals in daily.items()
+    ]
+    medicine_ops = [
+        UpdateOne(
+            {"tenant_id": tenant_id, "store_id": store_id, "day": day, "medicine_id": medicine_id},
+            {
+                "$inc": {"total_quantity": totals["total_quantity"], "total_revenue": totals["total_revenue"]},
+                "$set": {"medicine_name": totals["medicine_name"]}
+            },
+            upsert=True
+        )
+        for (tenant_id, store_id, day, medicine_id), totals in per_medicine.items()
+    ]
+    return daily_ops, medicine_ops
+
+async def record_sale_writes(sale_obj: Sale, session=None):
+    """Persist a sale, its inventory decrements, the customer's loyalty update and the sales rollups"""
+    await db.sales.insert_one(sale_obj.dict(), session=session)
+    
+    writes = []
+    
+    # Update medicine inventory in one round trip
+    if sale_obj.items:
+        writes.append(db.medicines.bulk_write(inventory_decrement_ops(sale_obj.items), ordered=True, session=session))
+    
+    # Update customer loyalty points and spending
+    if sale_obj.customer_id:
+        writes.append(db.customers.update_one(
+            {"id": sale_obj.customer_id},
+            {
+                "$inc": {
+                    "loyalty_points": sale_obj.loyalty_points_earned - sale_obj.loyalty_points_used,
+                    "total_spent": sale_obj.total_amount
+                }
+            },
+            session=session
+        ))
+    
+    # Update daily analytics rollups
+    daily_ops, medicine_ops = sales_rollup_ops([sale_obj])
+    writes.append(db.sales_daily_rollups.bulk_write(daily_ops, ordered=False, session=session))
+    if medicine_ops:
+        writes.append(db.sales_daily_medicine_rollups.bulk_write(medicine_ops, ordered=False, session=session))
+    
+    if session is None:
+        await asyncio.gather(*writes)
+    else:
+        # A session cannot be used concurrently
+        for write in writes:
+            await write
+    
+    # Invalidate cached stock and loyalty lists only once the new data is readable,
+    # so a version can never be paired with the data that preceded it
+    if sale_obj.items:
+        await bump_versions(sale_obj.tenant_id, "medicines", [sale_obj.store_id], session=session)
+    if sale_obj.customer_id:
+        await bump_versions(sale_obj.tenant_id, "customers", session=session)
+
+def check_sale_access(current_user: User):
     if current_user.role not in [UserRole.CASHIER, UserRole.PHARMACIST, UserRole.PHARMACY_TECHNICIAN]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions to process sales"
         )
-    
+
+def build_sale(sale_data: SaleCreate, tenant_id: str, store_id: str, cashier_id: str, **overrides) -> Sale:
+    """Price a sale and build its document"""
     # Calculate totals
     subtotal = sum(item["price"] * item["quantity"] for item in sale_data.items)
     tax_amount = subtotal * 0.08  # Use store tax rate
@@ -828,9 +2436,9 @@ async def create_sale(
     
     sale_dict = sale_data.dict()
     sale_dict.update({
-        "tenant_id": tenant.id,
+        "tenant_id": tenant_id,
         "store_id": store_id,
-        "cashier_id": current_user.id,
+        "cashier_id": cashier_id,
         "subtotal": subtotal,
         "tax_amount": tax_amount,
         "total_amount": total_amount,
@@ -838,38 +2446,213 @@ async def create_sale(
         "loyalty_points_earned": loyalty_points_earned,
         "receipt_number": f"RCP-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8]}"
     })
+    sale_dict.update(overrides)
     
-    sale_obj = Sale(**sale_dict)
-    await db.sales.insert_one(sale_obj.dict())
+    return Sale(**sale_dict)
+
+@api_router.post("/sales", response_model=Sale)
+async def create_sale(
+    sale_data: SaleCreate,
+    store_id: str,
+    current_user: User = Depends(get_current_user),
+    tenant: Tenant = Depends(get_current_tenant)
+):
+    """Process a sale/transaction"""
+    check_sale_access(current_user)
     
-    # Update medicine inventory
-    for item in sale_data.items:
-        await db.medicines.update_one(
-            {"id": item["medicine_id"]},
-            {"$inc": {"quantity_in_stock": -item["quantity"]}}
-        )
+    sale_obj = build_sale(sale_data, tenant.id, store_id, current_user.id)
     
-    # Update customer loyalty points and spending
-    if sale_data.customer_id:
-        await db.customers.update_one(
-            {"id": sale_data.customer_id},
-            {
-                "$inc": {
-                    "loyalty_points": loyalty_points_earned - sale_data.loyalty_points_used,
-                    "total_spent": total_amount
-                }
-            }
-        )
+    if SALE_TRANSACTIONS:
+        async with await mongo.client.start_session() as session:
+            async with session.start_transaction():
+                await record_sale_writes(sale_obj, session=session)
+    else:
+        await record_sale_writes(sale_obj)
     
     return sale_obj
 
+# Markers on batch sales whose side effects have not been applied yet
+SALE_EFFECT_MARKERS = {"effects_pending": "", "effects_claim": "", "effects_claimed_at": ""}
+
+async def apply_sale_effects(sales: List[Sale], session=None):
+    """Inventory, loyalty and rollup writes for `sales`, coalesced per medicine and per customer"""
+    stock_changes: Dict[str, int] = {}
+    customer_changes: Dict[str, Dict[str, float]] = {}
+    for sale in sales:
+        for item in sale.items:
+            stock_changes[item["medicine_id"]] = stock_changes.get(item["medicine_id"], 0) - item["quantity"]
+        if sale.customer_id:
+            change = customer_changes.setdefault(sale.customer_id, {"loyalty_points": 0, "total_spent": 0.0})
+            change["loyalty_points"] += sale.loyalty_points_earned - sale.loyalty_points_used
+            change["total_spent"] += sale.total_amount
+    
+    writes = []
+    if stock_changes:
+        writes.append(db.medicines.bulk_write([
+            UpdateOne({"id": medicine_id}, stock_adjustment_update(delta))
+            for medicine_id, delta in stock_changes.items()
+        ], ordered=False, session=session))
+    if customer_changes:
+        writes.append(db.customers.bulk_write([
+            UpdateOne({"id": customer_id}, {"$inc": change})
+            for customer_id, change in customer_changes.items()
+        ], ordered=False, session=session))
+    daily_ops, medicine_ops = sales_rollup_ops(sales)
+    if daily_ops:
+        writes.append(db.sales_daily_rollups.bulk_write(daily_ops, ordered=False, session=session))
+    if medicine_ops:
+        writes.append(db.sales_daily_medicine_rollups.bulk_write(medicine_ops, ordered=False, session=session))
+    if session is None:
+        await asyncio.gather(*writes)
+    else:
+        for write in writes:
+            await write
+    
+    # Bump list versions after the writes they describe have landed
+    if stock_changes:
+        for tenant_id, store_id in {(sale.tenant_id, sale.store_id) for sale in sales if sale.items}:
+            await bump_versions(tenant_id, "medicines", [store_id], session=session)
+    if customer_changes:
+        for tenant_id in {sale.tenant_id for sale in sales if sale.customer_id}:
+            await bump_versions(tenant_id, "customers", session=session)
+
+async def claim_stalled_sales(tenant_id: str, keys: List[str], claim: str) -> List[Sale]:
+    """Take over recorded sales whose effects an earlier attempt never finished applying"""
+    now = datetime.utcnow()
+    await db.sales.update_many(
+        {
+            "tenant_id": tenant_id,
+            "idempotency_key": {"$in": keys, "$type": "string"},
+            "effects_pending": True,
+            "effects_claimed_at": {"$lt": now - timedelta(seconds=SALE_EFFECTS_LEASE_SECONDS)}
+        },
+        {"$set": {"effects_claim": claim, "effects_claimed_at": now}}
+    )
+    return [Sale(**doc) async for doc in db.sales.find({"tenant_id": tenant_id, "effects_claim": claim}, {"_id": 0})]
+
+async def record_sales_batch(items: Dict[str, SaleBatchItem], tenant_id: str, store_id: str, cashier_id: str,
+                             session=None) -> tuple:
+    """Insert new sales and apply their effects; returns (applied sales, {duplicate key: sale id}).
+
+    In a transaction everything commits together. Otherwise new sales are
+    stored with an effects_pending marker that is cleared once their writes
+    land, and a retry re-applies sales still marked after the lease.
+    """
+    # $type lets the planner use the partial unique index on idempotency_key
+    existing = {}
+    async for sale in db.sales.find(
+        {"tenant_id": tenant_id, "idempotency_key": {"$in": list(items), "$type": "string"}},
+        {"_id": 0, "idempotency_key": 1, "id": 1, "effects_pending": 1},
+        session=session
+    ):
+        existing[sale["idempotency_key"]] = sale
+    duplicates = {key: sale["id"] for key, sale in existing.items()}
+    
+    sales = []
+    for key, item in items.items():
+        if key in existing:
+            continue
+        overrides = {"idempotency_key": key}
+        if item.created_at:
+            overrides["created_at"] = item.created_at
+        sale_data = SaleCreate(**item.dict(exclude={"idempotency_key", "created_at"}))
+        sales.append(build_sale(sale_data, tenant_id, store_id, cashier_id, **overrides))
+    
+    claim = str(uuid.uuid4())
+    markers = {} if session is not None else {
+        "effects_pending": True, "effects_claim": claim, "effects_claimed_at": datetime.utcnow()
+    }
+    
+    if sales:
+        try:
+            await db.sales.insert_many([{**sale.dict(), **markers} for sale in sales], ordered=False, session=session)
+        except BulkWriteError as exc:
+            # A concurrent retry may have inserted some keys since the lookup; inside a
+            # transaction the whole batch aborts and the client's retry sorts it out
+            raced = {sales[error["index"]].idempotency_key for error in exc.details.get("writeErrors", [])
+                     if error.get("code") == 11000}
+            if session is not None or len(raced) != len(exc.details.get("writeErrors", [])):
+                raise
+            async for sale in db.sales.find(
+                {"tenant_id": tenant_id, "idempotency_key": {"$in": list(raced), "$type": "string"}},
+                {"_id": 0, "idempotency_key": 1, "id": 1}
+            ):
+                duplicates[sale["idempotency_key"]] = sale["id"]
+            sales = [sale for sale in sales if sale.idempotency_key not in raced]
+    
+    if session is None:
+        stalled = [key for key, sale in existing.items() if sale.get("effects_pending")]
+        if stalled:
+            for sale in await claim_stalled_sales(tenant_id, stalled, claim):
+                duplicates.pop(sale.idempotency_key, None)
+                sales.append(sale)
+    
+    await apply_sale_effects(sales, session=session)
+    if session is None and sales:
+        await db.sales.update_many({"tenant_id": tenant_id, "effects_claim": claim}, {"$unset": SALE_EFFECT_MARKERS})
+    return sales, duplicates
+
+@api_router.post("/sales/batch")
+async def create_sales_batch(
+    batch: SaleBatchCreate,
+    store_id: str,
+    current_user: User = Depends(get_current_user),
+    tenant: Tenant = Depends(get_current_tenant)
+):
+    """Submit many queued sales at once.
+
+    Sales whose idempotency_key was already recorded are reported as duplicates
+    instead of being applied again. Inventory decrements and loyalty updates are
+    summed per medicine and per customer across the batch. A retry finishes
+    applying sales an interrupted attempt recorded but did not apply.
+    """
+    check_sale_access(current_user)
+    
+    # Keep the first occurrence of each key within the batch
+    items: Dict[str, SaleBatchItem] = {}
+    for item in batch.sales:
+        items.setdefault(item.idempotency_key, item)
+    
+    if SALE_TRANSACTIONS:
+        async with await mongo.client.start_session() as session:
+            async with session.start_transaction():
+                sales, duplicates = await record_sales_batch(items, tenant.id, store_id, current_user.id, session)
+    else:
+        sales, duplicates = await record_sales_batch(items, tenant.id, store_id, current_user.id)
+    
+    return {
+        "accepted": [
+            {"idempotency_key": sale.idempotency_key, "sale_id": sale.id, "receipt_number": sale.receipt_number}
+            for sale in sales
+        ],
+        "duplicates": [
+            {"idempotency_key": key, "sale_id": sale_id} for key, sale_id in duplicates.items()
+        ]
+    }
+
 # Dashboard/Analytics Routes
+MANAGER_DASHBOARD_ROLES = [UserRole.PHARMACY_OWNER, UserRole.PHARMACY_MANAGER, UserRole.SUPER_ADMIN]
+
+def dashboard_cache_key(current_user: User, tenant: Tenant) -> tuple:
+    """Managers in the same tenant/store scope share stats; staff stats are per cashier"""
+    store_scope = tuple(sorted(current_user.store_ids))
+    if current_user.role in MANAGER_DASHBOARD_ROLES:
+        return (tenant.id, store_scope, "manager")
+    return (tenant.id, store_scope, "staff", current_user.id)
+
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(
     current_user: User = Depends(get_current_user),
     tenant: Tenant = Depends(get_current_tenant)
 ):
     """Get dashboard statistics"""
+    return await dashboard_stats_cache.get_or_compute(
+        dashboard_cache_key(current_user, tenant),
+        lambda: compute_dashboard_stats(current_user, tenant)
+    )
+
+async def compute_dashboard_stats(current_user: User, tenant: Tenant) -> dict:
+    """Run the dashboard queries for one user's scope, on the reporting read preference"""
     stats = {}
     
     # Common filters
@@ -882,66 +2665,62 @@ async def get_dashboard_stats(
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     today_end = datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999)
     
-    if current_user.role in [UserRole.PHARMACY_OWNER, UserRole.PHARMACY_MANAGER, UserRole.SUPER_ADMIN]:
-        # Total customers
-        total_customers = await db.customers.count_documents({**tenant_filter, "is_active": True})
-        
-        # Today's sales
-        today_sales = await db.sales.find({
-            **store_filter,
-            "created_at": {"$gte": today_start, "$lte": today_end}
-        }).to_list(1000)
-        
-        today_revenue = sum(sale["total_amount"] for sale in today_sales)
-        
-        # Pending prescriptions
-        pending_prescriptions = await db.prescriptions.count_documents({
-            **store_filter,
-            "status": PrescriptionStatus.PENDING
-        })
+    if current_user.role in MANAGER_DASHBOARD_ROLES:
+        # Today's sales count and revenue in one $group
+        async def today_sales_summary():
+            pipeline = [
+                {"$match": {**store_filter, "created_at": {"$gte": today_start, "$lte": today_end}}},
+                {"$group": {"_id": None, "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}}
+            ]
+            result = await reporting_db.sales.aggregate(pipeline).to_list(1)
+            return (result[0]["count"], result[0]["revenue"]) if result else (0, 0)
         
-        # Low stock items
-        pipeline = [
-            {"$match": store_filter},
-            {"$match": {"$expr": {"$lte": ["$quantity_in_stock", "$min_stock_level"]}}},
-            {"$count": "low_stock_count"}
-        ]
-        low_stock_result = await db.medicines.aggregate(pipeline).to_list(1)
-        low_stock_count = low_stock_result[0]["low_stock_count"] if low_stock_result else 0
-        
-        # Expiring soon (30 days)
-        thirty_days_ahead = datetime.utcnow() + timedelta(days=30)
-        expiring_soon = await db.medicines.count_documents({
-            **store_filter,
-            "expiry_date": {"$lte": thirty_days_ahead}
-        })
+        # Independent queries run concurrently
+        (
+            total_customers,
+            (today_sales_count, today_revenue),
+            pending_prescriptions,
+            low_stock_items,
+            expiring_soon,
+            stores_count
+        ) = await asyncio.gather(
+            reporting_db.customers.count_documents({**tenant_filter, "is_active": True}),
+            today_sales_summary(),
+            reporting_db.prescriptions.count_documents({**store_filter, "status": PrescriptionStatus.PENDING}),
+            reporting_db.medicines.count_documents({**store_filter, "is_low_stock": True}),
+            expiring_medicines_count(tenant.id, current_user.store_ids),
+            reporting_db.stores.count_documents({**tenant_filter, "is_active": True})
+        )
         
         stats = {
             "total_customers": total_customers,
-            "today_sales_count": len(today_sales),
+            "today_sales_count": today_sales_count,
             "today_revenue": today_revenue,
             "pending_prescriptions": pending_prescriptions,
-            "low_stock_items": low_stock_count,
+            "low_stock_items": low_stock_items,
             "expiring_medicines": expiring_soon,
             "subscription_plan": tenant.subscription_plan,
             "subscription_status": tenant.subscription_status,
-            "stores_count": await db.stores.count_documents({**tenant_filter, "is_active": True})
+            "stores_count": stores_count
         }
     
     else:  # For other roles like cashier, technician
         # Today's sales by this user
-        today_my_sales = await db.sales.count_documents({
-            **store_filter,
-            "cashier_id": current_user.id,
-            "created_at": {"$gte": today_start, "$lte": today_end}
-        })
-        
-        stats = {
-            "my_sales_today": today_my_sales,
-            "pending_prescriptions": await db.prescriptions.count_documents({
+        today_my_sales, pending_prescriptions = await asyncio.gather(
+            reporting_db.sales.count_documents({
+                **store_filter,
+                "cashier_id": current_user.id,
+                "created_at": {"$gte": today_start, "$lte": today_end}
+            }),
+            reporting_db.prescriptions.count_documents({
                 **store_filter,
                 "status": PrescriptionStatus.PENDING
             })
+        )
+        
+        stats = {
+            "my_sales_today": today_my_sales,
+            "pending_prescriptions": pending_prescriptions
         }
     
     return stats
@@ -959,8 +2738,61 @@ async def get_notifications(
     if unread_only:
         query["read"] = False
     
-    notifications = await db.notifications.find(query).sort("created_at", -1).limit(50).to_list(50)
-    return [Notification(**notif) for notif in notifications]
+    notifications = await db.notifications.find(query, {"_id": 0}).sort("created_at", -1).limit(50).to_list(50)
+    return list_response(notifications, None, Notification)
+
+@api_router.post("/notifications/stream-ticket")
+async def create_stream_ticket(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Issue a short-lived ticket that only opens the notification stream, so the session token stays out of URLs"""
+    claims = decode_token(credentials.credentials)
+    if "purpose" in claims:
+        raise credentials_error()
+    await authenticate_claims(claims)
+    
+    lifetime = min(NOTIFICATION_STREAM_TICKET_SECONDS, max(0, int(claims["exp"] - time.time())))
+    ticket_claims = {key: value for key, value in claims.items() if key != "exp"}
+    ticket_claims.update({"purpose": STREAM_TICKET_PURPOSE, "session_exp": claims["exp"]})
+    ticket = create_access_token(data=ticket_claims, expires_delta=timedelta(seconds=lifetime))
+    return {"ticket": ticket, "expires_in": lifetime}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    claims: dict = Depends(get_stream_claims)
+):
+    """Server-Sent Events stream of new notifications for the current user.
+
+    The stream closes once the session token expires or is revoked; the
+    session is re-checked at every keep-alive.
+    """
+    current_user = await authenticate_claims(claims)
+    queue = notification_hub.subscribe(current_user.id)
+    
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                remaining = claims["session_exp"] - time.time()
+                try:
+                    notification = await asyncio.wait_for(
+                        queue.get(), max(0, min(NOTIFICATION_STREAM_KEEPALIVE_SECONDS, remaining))
+                    )
+                except asyncio.TimeoutError:
+                    if not await stream_session_active(claims):
+                        yield "event: session_expired\ndata: {}\n\n"
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                payload = json.dumps(jsonable_encoder(Notification(**notification)))
+                yield f"id: {notification['id']}\nevent: notification\ndata: {payload}\n\n"
+        finally:
+            notification_hub.unsubscribe(current_user.id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(
@@ -968,12 +2800,42 @@ async def mark_notification_read(
     current_user: User = Depends(get_current_user)
 ):
     """Mark notification as read"""
-    await db.notifications.update_one(
-        {"id": notification_id, "user_id": current_user.id},
+    # Filtering on read=False means only one concurrent writer decrements the counter
+    result = await db.notifications.update_one(
+        {"id": notification_id, "user_id": current_user.id, "read": False},
         {"$set": {"read": True}}
     )
+    await adjust_unread_count(current_user.id, -result.modified_count)
     return {"message": "Notification marked as read"}
 
+@api_router.get("/notifications/unread-count")
+async def get_unread_count(current_user: User = Depends(get_current_user)):
+    """Get the number of unread notifications"""
+    counter = await db.notification_counters.find_one({"user_id": current_user.id}, {"_id": 0, "unread": 1})
+    return {"unread": counter["unread"] if counter else 0}
+
+@api_router.post("/notifications/mark-read")
+async def mark_notifications_read(
+    selection: NotificationMarkRead,
+    current_user: User = Depends(get_current_user)
+):
+    """Mark several notifications as read, by id and/or everything before a timestamp"""
+    if selection.ids is None and selection.before is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide ids or before"
+        )
+    
+    query = {"user_id": current_user.id, "read": False}
+    if selection.ids is not None:
+        query["id"] = {"$in": selection.ids}
+    if selection.before is not None:
+        query["created_at"] = {"$lte": selection.before}
+    
+    result = await db.notifications.update_many(query, {"$set": {"read": True}})
+    await adjust_unread_count(current_user.id, -result.modified_count)
+    return {"message": "Notifications marked as read", "updated": result.modified_count}
+
 # Analytics Routes
 @api_router.get("/analytics/sales")
 async def get_sales_analytics(
@@ -985,11 +2847,12 @@ async def get_sales_analytics(
     """Get sales analytics"""
     check_subscription_limits(tenant, "reporting")
     
-    start_date = datetime.now() - timedelta(days=days)
+    start_day = sale_day(datetime.utcnow() - timedelta(days=days))
     
+    # Read from the daily rollups maintained by create_sale
     query = {
         "tenant_id": tenant.id,
-        "created_at": {"$gte": start_date}
+        "day": {"$gte": start_day}
     }
     
     if store_id:
@@ -1002,32 +2865,31 @@ async def get_sales_analytics(
         {"$match": query},
         {
             "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
-                "total_sales": {"$sum": "$total_amount"},
-                "transaction_count": {"$sum": 1}
+                "_id": "$day",
+                "total_sales": {"$sum": "$total_sales"},
+                "transaction_count": {"$sum": "$transaction_count"}
             }
         },
         {"$sort": {"_id": 1}}
     ]
     
-    sales_by_day = await db.sales.aggregate(pipeline).to_list(100)
+    sales_by_day = await reporting_db.sales_daily_rollups.aggregate(pipeline).to_list(days + 1)
     
     # Top selling medicines
     pipeline = [
         {"$match": query},
-        {"$unwind": "$items"},
         {
             "$group": {
-                "_id": "$items.medicine_name",
-                "total_quantity": {"$sum": "$items.quantity"},
-                "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}
+                "_id": "$medicine_name",
+                "total_quantity": {"$sum": "$total_quantity"},
+                "total_revenue": {"$sum": "$total_revenue"}
             }
         },
         {"$sort": {"total_quantity": -1}},
         {"$limit": 10}
     ]
     
-    top_medicines = await db.sales.aggregate(pipeline).to_list(10)
+    top_medicines = await reporting_db.sales_daily_medicine_rollups.aggregate(pipeline).to_list(10)
     
     return {
         "sales_by_day": sales_by_day,
@@ -1035,17 +2897,318 @@ async def get_sales_analytics(
         "period_days": days
     }
 
-# Include the router in the main app
-app.include_router(api_router)
+# Background Jobs
+EXPIRY_ALERT_ROLES = [UserRole.PHARMACY_OWNER, UserRole.PHARMACY_MANAGER, UserRole.PHARMACIST]
+
+def expiry_candidate_filter(
+    tenant_id: str, horizon: datetime, previous_horizon: Optional[datetime] = None, last_run: Optional[datetime] = None
+) -> dict:
+    """Lots an ExpiryAlertScheduler run reads (shared with manage.py audit-query-plans)"""
+    if previous_horizon is None:
+        return {"tenant_id": tenant_id, "expiry_date": {"$lte": horizon}}
+    return {"tenant_id": tenant_id, "$or": [
+        {"expiry_date": {"$gt": previous_horizon, "$lte": horizon}},
+        {"expiry_date": {"$lte": previous_horizon}, "created_at": {"$gt": last_run}}
+    ]}
+
+def expiring_count_filter(tenant_id: str, store_ids: List[str], horizon: datetime) -> dict:
+    """Live expiring-lot count used when there is no scheduler summary"""
+    query = {"tenant_id": tenant_id, "expiry_date": {"$lte": horizon}}
+    if store_ids:
+        query["store_id"] = {"$in": store_ids}
+    return query
+
+def expiry_summary_filter(tenant_id: str) -> dict:
+    """A tenant's scheduler summary, if the last run that wrote it is under one interval old"""
+    return {
+        "tenant_id": tenant_id,
+        "horizon_days": EXPIRY_ALERT_DAYS,
+        "computed_at": {"$gte": datetime.utcnow() - timedelta(seconds=EXPIRY_SCAN_INTERVAL_SECONDS)}
+    }
+
+class ExpiryAlertScheduler:
+    """Periodically turns newly expiring lots into deduplicated EXPIRY_ALERT notifications.
+
+    A high-water mark in db.scheduler_state records the expiry horizon and time of
+    the last run, so each run only reads lots whose expiry_date entered the alert
+    window since then, plus lots created since then that were already inside it.
+    The run also stores per-store expiring counts in db.expiry_summaries for the dashboard.
+    """
+
+    STATE_ID = "expiry_alerts"
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+    def __init__(self, interval_seconds: float, alert_days: int, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.alert_days = alert_days
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _claim_run(self, now: datetime) -> Optional[dict]:
+        """Take the run lease so only one worker scans per interval"""
+        try:
+            return await db.scheduler_state.find_one_and_update(
+                {"_id": self.STATE_ID, "$or": [
+                    {"lease_until": {"$lte": now}}, {"lease_until": {"$exists": False}}
+                ]},
+                {"$set": {"lease_until": now + timedelta(seconds=self.interval_seconds / 2)}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            ) or {}
+        except DuplicateKeyError:
+            # Duplicate key on upsert: another worker holds the lease
+            return None
+
+    async def _recipients(self, tenant_id: str) -> List[dict]:
+        return await db.users.find(
+            {"tenant_id": tenant_id, "is_active": True, "role": {"$in": EXPIRY_ALERT_ROLES}},
+            {"_id": 0, "id": 1, "store_ids": 1}
+        ).to_list(None)
+
+    async def _scan_tenant(self, tenant_id: str, candidate_filter: dict) -> int:
+        recipients = await self._recipients(tenant_id)
+        if not recipients:
+            return 0
+        
+        inserted = 0
+        batch = []
+        cursor = db.medicines.find(
+            candidate_filter,
+            {"_id": 0, "id": 1, "store_id": 1, "name": 1, "batch_number": 1, "expiry_date": 1}
+        ).batch_size(self.batch_size)
+        async for medicine in cursor:
+            for user in recipients:
+                if user.get("store_ids") and medicine["store_id"] not in user["store_ids"]:
+                    continue
+                notification = Notification(
+                    tenant_id=tenant_id,
+                    user_id=user["id"],
+                    type=NotificationType.EXPIRY_ALERT,
+                    title="Expiry Alert",
+                    message=f"{medicine['name']} (batch {medicine['batch_number']}) expires on "
+                            f"{medicine['expiry_date'].strftime('%Y-%m-%d')}",
+                    data={
+                        "medicine_id": medicine["id"],
+                        "store_id": medicine["store_id"],
+                        "expiry_date": medicine["expiry_date"].isoformat()
+                    }
+                ).dict()
+                notification["dedup_key"] = f"expiry:{medicine['id']}:{medicine['expiry_date'].isoformat()}"
+                batch.append(notification)
+            if len(batch) >= self.batch_size:
+                inserted += len(await insert_notifications(batch))
+                batch = []
+        inserted += len(await insert_notifications(batch))
+        return inserted
+
+    async def _refresh_summary(self, tenant_id: str, horizon: datetime, now: datetime):
+        counts = await db.medicines.aggregate([
+            {"$match": {"tenant_id": tenant_id, "expiry_date": {"$lte": horizon}}},
+            {"$group": {"_id": "$store_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        await db.expiry_summaries.update_one(
+            {"tenant_id": tenant_id},
+            {"$set": {
+                "stores": {row["_id"]: row["count"] for row in counts},
+                "horizon_days": self.alert_days,
+                "computed_at": now
+            }},
+            upsert=True
+        )
+
+    async def run_once(self) -> int:
+        now = datetime.utcnow()
+        state = await self._claim_run(now)
+        if state is None:
+            return 0
+        
+        horizon = now + timedelta(days=self.alert_days)
+        previous_horizon = state.get("horizon")
+        last_run = state.get("last_run")
+        
+        inserted = 0
+        async for tenant in db.tenants.find({"is_active": True}, {"_id": 0, "id": 1}):
+            candidate_filter = expiry_candidate_filter(tenant["id"], horizon, previous_horizon, last_run)
+            inserted += await self._scan_tenant(tenant["id"], candidate_filter)
+            await self._refresh_summary(tenant["id"], horizon, now)
+        
+        await db.scheduler_state.update_one(
+            {"_id": self.STATE_ID},
+            {"$set": {"horizon": horizon, "last_run": now}}
+        )
+        logger.info(f"Expiry scan created {inserted} notifications")
+        return inserted
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Expiry scan failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+expiry_alert_scheduler = ExpiryAlertScheduler(
+    EXPIRY_SCAN_INTERVAL_SECONDS, EXPIRY_ALERT_DAYS, EXPIRY_SCAN_BATCH_SIZE
 )
 
+async def expiring_medicines_count(tenant_id: str, store_ids: List[str]) -> int:
+    """Precomputed expiring count from the scheduler, falling back to a live count"""
+    if EXPIRY_SCHEDULER_ENABLED:
+        # A summary older than one scan interval means the scheduler has stalled (or the
+        # alert window changed), so it no longer reflects stock writes or the moving horizon
+        summary = await reporting_db.expiry_summaries.find_one(
+            expiry_summary_filter(tenant_id), {"_id": 0, "stores": 1}
+        )
+        if summary is not None:
+            stores = summary["stores"]
+            return sum(count for store_id, count in stores.items() if not store_ids or store_id in store_ids)
+    
+    horizon = datetime.utcnow() + timedelta(days=EXPIRY_ALERT_DAYS)
+    return await reporting_db.medicines.count_documents(expiring_count_filter(tenant_id, store_ids, horizon))
+
+# Index Registry
+class IndexSpec(BaseModel):
+    """An index and the routes/jobs whose query shapes depend on it"""
+    collection: str
+    keys: List[Tuple[str, int]]
+    options: Dict[str, Any] = {}
+    used_by: List[str] = []
+
+INDEX_REGISTRY: List[IndexSpec] = [
+    # Users
+    IndexSpec(collection="users", keys=[("email", 1)],
+              used_by=["get_current_user", "login_user", "register_user"]),
+    IndexSpec(collection="users", keys=[("id", 1)],
+              used_by=["login_user", "TokenVersionCache", "revoke_user_tokens", "update_user_document"]),
+    IndexSpec(collection="users", keys=[("tenant_id", 1), ("role", 1)],
+              used_by=["ExpiryAlertScheduler"]),
+    # Tenants
+    IndexSpec(collection="tenants", keys=[("subdomain", 1)],
+              used_by=["register_tenant", "login_user"]),
+    IndexSpec(collection="tenants", keys=[("id", 1)], options={"unique": True},
+              used_by=["get_current_tenant", "login_user"]),
+    IndexSpec(collection="tenants", keys=[("is_active", 1)],
+              used_by=["ExpiryAlertScheduler"]),
+    # Stores
+    IndexSpec(collection="stores", keys=[("tenant_id", 1), ("is_active", 1), ("id", 1)],
+              used_by=["get_stores", "create_store", "get_dashboard_stats"]),
+    IndexSpec(collection="stores", keys=[("id", 1)], options={"unique": True},
+              used_by=["store lookups by id"]),
+    # Medicines
+    IndexSpec(collection="medicines", keys=[("id", 1)], options={"unique": True},
+              used_by=["create_sale", "fetch_by_ids"]),
+    IndexSpec(collection="medicines", keys=[("tenant_id", 1), ("created_at", 1), ("id", 1)],
+              used_by=["get_medicines"]),
+    IndexSpec(collection="medicines", keys=[("tenant_id", 1), ("store_id", 1), ("created_at", 1), ("id", 1)],
+              used_by=["get_medicines"]),
+    IndexSpec(collection="medicines", keys=[("tenant_id", 1), ("search_terms", 1)],
+              used_by=["get_medicines"]),
+    IndexSpec(collection="medicines", keys=[("tenant_id", 1), ("store_id", 1), ("is_low_stock", 1)],
+              options={"name": "low_stock", "partialFilterExpression": {"is_low_stock": True}},
+              used_by=["get_medicines", "get_dashboard_stats"]),
+    IndexSpec(collection="medicines", keys=[("tenant_id", 1), ("store_id", 1), ("expiry_date", 1)],
+              used_by=["get_medicines", "expiring_medicines_count"]),
+    IndexSpec(collection="medicines", keys=[("tenant_id", 1), ("expiry_date", 1)],
+              used_by=["ExpiryAlertScheduler", "expiring_medicines_count"]),
+    # Customers
+    IndexSpec(collection="customers", keys=[("id", 1)], options={"unique": True},
+              used_by=["create_sale", "attach_customer_names"]),
+    IndexSpec(collection="customers", keys=[("tenant_id", 1), ("created_at", 1), ("id", 1)],
+              used_by=["get_customers", "get_dashboard_stats"]),
+    IndexSpec(collection="customers", keys=[("tenant_id", 1), ("search_phone", 1)],
+              used_by=["get_customers"]),
+    IndexSpec(collection="customers", keys=[("tenant_id", 1), ("search_last_name", 1), ("search_first_name", 1)],
+              used_by=["get_customers"]),
+    IndexSpec(collection="customers", keys=[("tenant_id", 1), ("search_first_name", 1), ("search_last_name", 1)],
+              used_by=["get_customers"]),
+    IndexSpec(collection="customers", keys=[("tenant_id", 1), ("search_email", 1)],
+              used_by=["get_customers"]),
+    # Prescriptions
+    IndexSpec(collection="prescriptions", keys=[("id", 1)], options={"unique": True},
+              used_by=["prescription lookups by id"]),
+    IndexSpec(collection="prescriptions", keys=[("tenant_id", 1), ("created_at", -1), ("id", -1)],
+              used_by=["get_prescriptions"]),
+    IndexSpec(collection="prescriptions", keys=[("tenant_id", 1), ("store_id", 1), ("created_at", -1), ("id", -1)],
+              used_by=["get_prescriptions"]),
+    IndexSpec(collection="prescriptions", keys=[("tenant_id", 1), ("customer_id", 1), ("created_at", -1), ("id", -1)],
+              used_by=["get_prescriptions"]),
+    IndexSpec(collection="prescriptions", keys=[("tenant_id", 1), ("status", 1), ("store_id", 1)],
+              used_by=["get_prescriptions", "get_dashboard_stats"]),
+    IndexSpec(collection="prescriptions", keys=[("tenant_id", 1), ("status", 1), ("created_at", -1), ("id", -1)],
+              used_by=["get_prescriptions"]),
+    # Sales
+    IndexSpec(collection="sales", keys=[("tenant_id", 1), ("created_at", -1)],
+              used_by=["get_dashboard_stats", "rebuild-sales-rollups"]),
+    IndexSpec(collection="sales", keys=[("tenant_id", 1), ("store_id", 1), ("created_at", -1)],
+              used_by=["get_dashboard_stats"]),
+    IndexSpec(collection="sales", keys=[("tenant_id", 1), ("cashier_id", 1), ("created_at", -1)],
+              used_by=["get_dashboard_stats"]),
+    IndexSpec(collection="sales", keys=[("tenant_id", 1), ("customer_id", 1), ("created_at", -1)],
+              used_by=["sales by customer"]),
+    IndexSpec(collection="sales", keys=[("tenant_id", 1), ("idempotency_key", 1)],
+              options={"unique": True, "partialFilterExpression": {"idempotency_key": {"$type": "string"}}},
+              used_by=["create_sales_batch"]),
+    IndexSpec(collection="sales", keys=[("effects_claim", 1)], options={"sparse": True},
+              used_by=["record_sales_batch", "claim_stalled_sales"]),
+    # Sales rollups ($merge in rebuild-sales-rollups requires the unique keys)
+    IndexSpec(collection="sales_daily_rollups", keys=[("tenant_id", 1), ("store_id", 1), ("day", 1)],
+              options={"unique": True}, used_by=["create_sale", "rebuild-sales-rollups"]),
+    IndexSpec(collection="sales_daily_rollups", keys=[("tenant_id", 1), ("day", 1)],
+              used_by=["get_sales_analytics"]),
+    IndexSpec(collection="sales_daily_medicine_rollups",
+              keys=[("tenant_id", 1), ("store_id", 1), ("day", 1), ("medicine_id", 1)],
+              options={"unique": True}, used_by=["create_sale", "rebuild-sales-rollups"]),
+    IndexSpec(collection="sales_daily_medicine_rollups", keys=[("tenant_id", 1), ("day", 1)],
+              used_by=["get_sales_analytics"]),
+    # Notifications
+    IndexSpec(collection="notifications", keys=[("tenant_id", 1), ("user_id", 1), ("created_at", -1)],
+              used_by=["get_notifications"]),
+    IndexSpec(collection="notifications", keys=[("id", 1), ("user_id", 1)],
+              used_by=["mark_notification_read"]),
+    IndexSpec(collection="notifications", keys=[("user_id", 1), ("read", 1), ("created_at", -1)],
+              used_by=["mark_notifications_read", "reconcile-unread-counts"]),
+    IndexSpec(collection="notification_counters", keys=[("user_id", 1)], options={"unique": True},
+              used_by=["get_unread_count", "insert_notifications", "adjust_unread_count"]),
+    IndexSpec(collection="notifications", keys=[("user_id", 1), ("dedup_key", 1)],
+              options={"unique": True, "partialFilterExpression": {"dedup_key": {"$exists": True}}},
+              used_by=["ExpiryAlertScheduler"]),
+    IndexSpec(collection="expiry_summaries", keys=[("tenant_id", 1)], options={"unique": True},
+              used_by=["get_dashboard_stats", "ExpiryAlertScheduler"]),
+]
+
+async def create_indexes(database=None, collections: Optional[List[str]] = None):
+    """Create every registered index, optionally limited to some collections"""
+    database = database if database is not None else db
+    for spec in INDEX_REGISTRY:
+        if collections is None or spec.collection in collections:
+            await database[spec.collection].create_index(spec.keys, **spec.options)
+
+async def missing_unique_indexes(database=None) -> List[IndexSpec]:
+    """Registered unique indexes that do not exist (as unique) in the database"""
+    database = database if database is not None else db
+    existing = {}
+    missing = []
+    for spec in INDEX_REGISTRY:
+        if not spec.options.get("unique"):
+            continue
+        if spec.collection not in existing:
+            info = await database[spec.collection].index_information()
+            existing[spec.collection] = {
+                tuple((field, int(direction)) for field, direction in index["key"])
+                for index in info.values() if index.get("unique")
+            }
+        if tuple(spec.keys) not in existing[spec.collection]:
+            missing.append(spec)
+    return missing
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1053,18 +3216,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database with indexes and default data"""
-    # Create indexes for better performance
-    await db.users.create_index("email")
-    await db.tenants.create_index("subdomain")
-    await db.medicines.create_index([("tenant_id", 1), ("store_id", 1)])
-    await db.sales.create_index([("tenant_id", 1), ("created_at", -1)])
-    await db.customers.create_index([("tenant_id", 1), ("phone", 1)])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open this worker's Mongo pool and background jobs; close them on shutdown"""
+    mongo.connect()
+    if CREATE_INDEXES_ON_STARTUP:
+        await create_indexes()
+    missing = await missing_unique_indexes()
+    if missing:
+        described = ", ".join(f"{spec.collection}{[field for field, _ in spec.keys]}" for spec in missing)
+        message = f"Missing unique indexes: {described}; run `manage.py create-indexes`"
+        if REQUIRE_UNIQUE_INDEXES:
+            mongo.close()
+            raise RuntimeError(message)
+        logger.error(message)
+    
+    if STATELESS_AUTH:
+        token_version_cache.start()
+    if EXPIRY_SCHEDULER_ENABLED:
+        expiry_alert_scheduler.start()
+    if NOTIFICATION_CHANGE_STREAM:
+        notification_change_stream.start()
     
     logger.info("PharmaCloud SaaS started successfully!")
+    try:
+        yield
+    finally:
+        token_version_cache.stop()
+        expiry_alert_scheduler.stop()
+        notification_change_stream.stop()
+        mongo.close()
+        password_hasher.shutdown()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app; importing this module opens no connections"""
+    app = FastAPI(
+        title="PharmaCloud SaaS",
+        description="Advanced Pharmacy Management Software as a Service",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    app.include_router(api_router)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
+    )
+    
+    # Brotli for clients that accept it, gzip otherwise; SSE must not be buffered
+    app.add_middleware(
+        BrotliMiddleware,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        gzip_fallback=True,
+        excluded_handlers=["/api/notifications/stream"]
+    )
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Single-process entry point (`uvicorn server:app`); see config/wsgi.py for multi-worker serving
+app = create_app()
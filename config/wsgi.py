@@ -1 +1,48 @@
+"""
+ASGI entry point for multi-process serving. Each worker process builds its own
+app and opens its own Mongo pool in the lifespan, so nothing is shared across
+the fork.
 
+Run `manage.py create-indexes` once per deploy before starting workers. The
+startup check refuses to start while any registered unique index is missing,
+so a fresh database will not serve requests until create-indexes has run
+(REQUIRE_UNIQUE_INDEXES=false only logs the error). From the repository root,
+which is the directory that contains both config/ and backend/:
+
+    python backend/manage.py create-indexes
+    uvicorn config.wsgi:application --host 0.0.0.0 --port 8001 --workers 4
+
+or under gunicorn:
+
+    gunicorn config.wsgi:application -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8001
+
+From any other directory, point the server at the repository root with
+`uvicorn --app-dir /path/to/repo config.wsgi:application` (gunicorn: `--chdir`).
+`python config/wsgi.py` works from anywhere.
+
+Size MONGO_MAX_POOL_SIZE per worker: workers x pool size must stay below the
+server's connection limit.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from server import create_app  # noqa: E402
+
+application = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "config.wsgi:application",
+        app_dir=str(ROOT),
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8001")),
+        workers=int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+    )
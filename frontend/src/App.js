@@ -147,13 +147,71 @@ const AuthProvider = ({ children }) => {
     }
   }, [token]);
 
+  // Push new notifications over Server-Sent Events instead of polling. EventSource
+  // cannot send headers, so it connects with a short-lived stream ticket rather
+  // than putting the session token in the URL.
+  useEffect(() => {
+    if (!token) return;
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const reconnectLater = () => {
+      if (!closed) {
+        retryTimer = setTimeout(connect, 5000);
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const response = await axios.post(`${API}/notifications/stream-ticket`, null, {
+          headers: { Authorization: `Bearer ${token}` }
+        });
+        if (closed) return;
+        source = new EventSource(`${API}/notifications/stream?ticket=${encodeURIComponent(response.data.ticket)}`);
+        // Events sent while the stream was down are not replayed, so resync the list and
+        // unread count every time it (re)opens
+        source.onopen = () => loadNotifications();
+        source.addEventListener('notification', (event) => {
+          const notification = JSON.parse(event.data);
+          setNotifications(prev => [notification, ...prev].slice(0, 50));
+          if (!notification.read) {
+            setUnreadCount(prev => prev + 1);
+          }
+        });
+        // The session expired or was revoked; stay closed until the user logs in again
+        source.addEventListener('session_expired', () => source.close());
+        // Tickets expire quickly, so reconnect with a fresh one instead of EventSource's own retry
+        source.onerror = () => {
+          source.close();
+          reconnectLater();
+        };
+      } catch (error) {
+        if (!error.response || error.response.status !== 401) {
+          console.error('Failed to open notification stream:', error);
+          reconnectLater();
+        }
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [token]);
+
   const loadNotifications = async () => {
     try {
       const response = await axios.get(`${API}/notifications`, {
         headers: { Authorization: `Bearer ${token}` }
       });
       setNotifications(response.data);
-      setUnreadCount(response.data.filter(n => !n.read).length);
+      const unread = await axios.get(`${API}/notifications/unread-count`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setUnreadCount(unread.data.unread);
     } catch (error) {
       console.error('Failed to load notifications:', error);
     }
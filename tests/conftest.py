@@ -0,0 +1,56 @@
+"""
+Shared fixtures: the app wired to an in-memory mongomock database, and helpers
+to seed users and mint their access tokens.
+"""
+
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    client = AsyncMongoMockClient()
+    server.mongo.client = client
+    server.mongo.database = client["pharmacloud_test"]
+    server.mongo.reporting_database = server.mongo.database
+    server.user_cache.clear()
+    server.tenant_cache.clear()
+    server.dashboard_stats_cache._entries.clear()
+    yield server.mongo.database
+    server.mongo.client = None
+    server.mongo.database = None
+    server.mongo.reporting_database = None
+
+
+@pytest.fixture
+def api(database):
+    """A TestClient without the lifespan, so no real Mongo connection or index check"""
+    return TestClient(server.create_app())
+
+
+@pytest.fixture
+def make_user(database):
+    """Insert a user document and return it with Authorization headers for its token"""
+    def make(role, tenant_id="tenant-1", **fields):
+        user = server.User(
+            tenant_id=tenant_id,
+            email=f"{role.value}-{uuid.uuid4().hex[:8]}@example.com",
+            name=role.value.replace("_", " ").title(),
+            role=role,
+            **fields
+        ).dict()
+        user.update({"hashed_password": "unused", "token_version": 0})
+        asyncio.run(database.users.insert_one(dict(user)))
+        token = server.create_access_token(data=server.build_token_claims(user))
+        return user, {"Authorization": f"Bearer {token}"}
+    return make
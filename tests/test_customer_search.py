@@ -0,0 +1,66 @@
+"""
+customer_search_filter against customers stored with customer_search_keys:
+every lookup the old case-insensitive regex served must still match.
+"""
+
+import mongomock
+import pytest
+
+from server import customer_search_filter, customer_search_keys
+
+CUSTOMERS = [
+    ("Siobhan", "O'Brien", "555-0101", "siobhan@example.com"),
+    ("Dick", "Van Dyke", "555-0102", "dick@example.com"),
+    ("Mary Ann", "Smith", "555-0103", "maryann@example.com"),
+    ("John", "Smith", "555-0104", "john.smith@example.com"),
+    ("Anne", "D’Arcy", "555-0105", "anne@example.com"),
+]
+
+
+@pytest.fixture
+def customers():
+    collection = mongomock.MongoClient().db.customers
+    for first_name, last_name, phone, email in CUSTOMERS:
+        doc = {"first_name": first_name, "last_name": last_name, "phone": phone, "email": email}
+        doc.update(customer_search_keys(doc))
+        collection.insert_one(doc)
+    return collection
+
+
+def search(customers, text):
+    return sorted(f"{doc['first_name']} {doc['last_name']}" for doc in customers.find(customer_search_filter(text)))
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("O'Brien", ["Siobhan O'Brien"]),
+    ("o’brien", ["Siobhan O'Brien"]),
+    ("obri", ["Siobhan O'Brien"]),
+    ("siobhan o'b", ["Siobhan O'Brien"]),
+    ("d'arcy", ["Anne D’Arcy"]),
+])
+def test_apostrophe_names(customers, text, expected):
+    assert search(customers, text) == expected
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("van dyke", ["Dick Van Dyke"]),
+    ("Van Dyke", ["Dick Van Dyke"]),
+    ("dick van d", ["Dick Van Dyke"]),
+    ("van dyke dick", ["Dick Van Dyke"]),
+    ("mary ann", ["Mary Ann Smith"]),
+    ("mary ann smith", ["Mary Ann Smith"]),
+    ("smith mary", ["Mary Ann Smith"]),
+    ("john smi", ["John Smith"]),
+    ("smith", ["John Smith", "Mary Ann Smith"]),
+])
+def test_multi_word_names(customers, text, expected):
+    assert search(customers, text) == expected
+
+
+def test_phone_and_email(customers):
+    assert search(customers, "555-0104") == ["John Smith"]
+    assert search(customers, "john.smith@") == ["John Smith"]
+
+
+def test_blank_query_adds_no_clauses():
+    assert customer_search_filter("   ") == {}
@@ -0,0 +1,59 @@
+"""
+expiring_medicines_count: the scheduler's summary is only trusted while the
+scheduler is enabled and has refreshed it within one scan interval.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def expiring(database):
+    """Two lots inside the alert window in store-1, and a summary that disagrees with them"""
+    def seed(computed_at):
+        async def insert():
+            soon = datetime.utcnow() + timedelta(days=3)
+            await database.medicines.insert_many([
+                {"id": "med-1", "tenant_id": "tenant-1", "store_id": "store-1", "expiry_date": soon},
+                {"id": "med-2", "tenant_id": "tenant-1", "store_id": "store-1", "expiry_date": soon},
+            ])
+            await database.expiry_summaries.insert_one({
+                "tenant_id": "tenant-1", "stores": {"store-1": 7}, "horizon_days": server.EXPIRY_ALERT_DAYS,
+                "computed_at": computed_at,
+            })
+        asyncio.run(insert())
+    return seed
+
+
+def count(store_ids=()):
+    return asyncio.run(server.expiring_medicines_count("tenant-1", list(store_ids)))
+
+
+def test_fresh_summary_is_used(expiring, monkeypatch):
+    monkeypatch.setattr(server, "EXPIRY_SCHEDULER_ENABLED", True)
+    expiring(datetime.utcnow())
+    assert count() == 7
+    assert count(["store-2"]) == 0
+
+
+def test_stale_summary_falls_back_to_live_count(expiring, monkeypatch):
+    monkeypatch.setattr(server, "EXPIRY_SCHEDULER_ENABLED", True)
+    expiring(datetime.utcnow() - timedelta(seconds=server.EXPIRY_SCAN_INTERVAL_SECONDS + 60))
+    assert count() == 2
+
+
+def test_disabled_scheduler_uses_live_count(expiring, monkeypatch):
+    monkeypatch.setattr(server, "EXPIRY_SCHEDULER_ENABLED", False)
+    expiring(datetime.utcnow())
+    assert count(["store-1"]) == 2
+
+
+def test_summary_for_another_alert_window_is_ignored(expiring, monkeypatch):
+    monkeypatch.setattr(server, "EXPIRY_SCHEDULER_ENABLED", True)
+    expiring(datetime.utcnow())
+    monkeypatch.setattr(server, "EXPIRY_ALERT_DAYS", server.EXPIRY_ALERT_DAYS + 30)
+    assert count() == 2
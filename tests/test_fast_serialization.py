@@ -0,0 +1,154 @@
+"""
+Contract tests for FastListSerializer: for any stored document the fast path
+must produce the same JSON as the response_model would.
+"""
+
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import FAST_SERIALIZERS, Customer, Medicine, Notification, Store  # noqa: E402
+
+CREATED_AT = datetime(2024, 3, 1, 9, 30, 15, 123000)
+
+STORE_DOC = {
+    "_id": "6600f0c2a1b2c3d4e5f60718",
+    "id": str(uuid.uuid4()),
+    "tenant_id": "tenant-1",
+    "name": "Main Street",
+    "license_number": "LIC-001",
+    "address": "1 Main Street",
+    "phone": "555-0100",
+    "email": "main@example.com",
+    "operating_hours": {"monday": "9:00-18:00"},
+    "tax_rate": 0.0825,
+    "is_active": True,
+    "created_at": CREATED_AT,
+}
+
+MEDICINE_DOC = {
+    "_id": "6600f0c2a1b2c3d4e5f60719",
+    "id": str(uuid.uuid4()),
+    "tenant_id": "tenant-1",
+    "store_id": STORE_DOC["id"],
+    "name": "Amoxicillin",
+    "brand_name": "Amoxil",
+    "generic_name": "amoxicillin",
+    "ndc_number": "0000-0000-01",
+    "category": "antibiotic",
+    "dosage_form": "capsule",
+    "strength": "500mg",
+    "manufacturer": "Generic Labs",
+    "unit_cost": 2,
+    "selling_price": 4.5,
+    "quantity_in_stock": 120,
+    "min_stock_level": 20,
+    "max_stock_level": 500,
+    "expiry_date": datetime(2026, 1, 31),
+    "batch_number": "B-42",
+    "side_effects": ["nausea"],
+    "is_low_stock": False,
+    "search_terms": ["amoxicillin", "amoxil"],
+    "created_at": CREATED_AT,
+    "updated_at": CREATED_AT,
+}
+
+CUSTOMER_DOC = {
+    "_id": "6600f0c2a1b2c3d4e5f6071a",
+    "id": str(uuid.uuid4()),
+    "tenant_id": "tenant-1",
+    "first_name": "Ada",
+    "last_name": "Lovelace",
+    "email": "ada@example.com",
+    "phone": "555-0101",
+    "date_of_birth": datetime(1990, 12, 10),
+    "allergies": ["penicillin"],
+    "loyalty_points": 12,
+    "total_spent": 150,
+    "search_keys": ["ada", "lovelace", "5550101"],
+    "created_at": CREATED_AT,
+}
+
+NOTIFICATION_DOC = {
+    "_id": "6600f0c2a1b2c3d4e5f6071b",
+    "id": str(uuid.uuid4()),
+    "tenant_id": "tenant-1",
+    "user_id": "user-1",
+    "type": "low_stock",
+    "title": "Low stock",
+    "message": "Amoxicillin is below its minimum level",
+    "data": {"medicine_id": MEDICINE_DOC["id"]},
+    "dedup_key": "low_stock:" + MEDICINE_DOC["id"],
+    "created_at": CREATED_AT,
+}
+
+FIXTURES = [
+    (Store, STORE_DOC),
+    (Medicine, MEDICINE_DOC),
+    (Customer, CUSTOMER_DOC),
+    (Notification, NOTIFICATION_DOC),
+]
+
+FACTORY_FIELDS = ("id", "created_at", "updated_at")
+
+
+def fast_dump(model, doc):
+    return orjson.loads(FAST_SERIALIZERS[model].dumps([doc]))[0]
+
+
+def model_dump(model, doc):
+    return model(**doc).model_dump(mode="json")
+
+
+def legacy(doc):
+    """The same document as written before id/created_at/updated_at existed"""
+    return {key: value for key, value in doc.items() if key not in FACTORY_FIELDS}
+
+
+@pytest.mark.parametrize("model,doc", FIXTURES, ids=lambda value: getattr(value, "__name__", ""))
+def test_matches_response_model(model, doc):
+    assert fast_dump(model, doc) == model_dump(model, doc)
+
+
+@pytest.mark.parametrize("model,doc", FIXTURES, ids=lambda value: getattr(value, "__name__", ""))
+def test_missing_optional_fields_get_defaults(model, doc):
+    required = {name for name, field in model.model_fields.items() if field.is_required()}
+    minimal = {key: value for key, value in doc.items() if key in required or key in FACTORY_FIELDS}
+    assert fast_dump(model, minimal) == model_dump(model, minimal)
+
+
+@pytest.mark.parametrize("model,doc", FIXTURES, ids=lambda value: getattr(value, "__name__", ""))
+def test_legacy_documents_fill_default_factory_fields(model, doc):
+    fast = fast_dump(model, legacy(doc))
+    expected = model_dump(model, legacy(doc))
+    assert fast.keys() == expected.keys()
+    generated = [name for name in FACTORY_FIELDS if name in model.model_fields]
+    for name in generated:
+        assert fast[name] is not None
+    # The generated values are random/current, so compare them by type
+    fast_model = model(**fast)
+    assert isinstance(fast_model.id, str)
+    assert isinstance(fast_model.created_at, datetime)
+    for name in expected:
+        if name not in generated:
+            assert fast[name] == expected[name]
+
+
+def test_integer_floats_are_emitted_as_floats():
+    fast = fast_dump(Medicine, MEDICINE_DOC)
+    assert isinstance(fast["unit_cost"], float)
+    assert fast["unit_cost"] == model_dump(Medicine, MEDICINE_DOC)["unit_cost"]
+    assert isinstance(fast_dump(Customer, CUSTOMER_DOC)["total_spent"], float)
+
+
+def test_internal_fields_are_not_emitted():
+    assert "_id" not in fast_dump(Medicine, MEDICINE_DOC)
+    assert "search_terms" not in fast_dump(Medicine, MEDICINE_DOC)
+    assert "search_keys" not in fast_dump(Customer, CUSTOMER_DOC)
+    assert "dedup_key" not in fast_dump(Notification, NOTIFICATION_DOC)
@@ -0,0 +1,95 @@
+"""
+GET /medicines?search=: ranking on normalized fields, paging through the
+ranked order, and rejecting search text with nothing to match on.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from server import MedicineCreate, UserRole
+
+TENANT = {
+    "id": "tenant-1", "name": "Test Pharmacy", "subdomain": "test", "subscription_plan": "professional",
+    "subscription_status": "active", "max_stores": 3, "features_enabled": [],
+    "subscription_expires_at": datetime.utcnow() + timedelta(days=30),
+}
+
+
+def medicine(name, **fields):
+    data = {
+        "name": name, "generic_name": "placebo", "ndc_number": "12345-678-90", "category": "antibiotic",
+        "dosage_form": "tablet", "strength": "500mg", "manufacturer": "Generic Labs", "unit_cost": 1.0, "selling_price": 2.0, "quantity_in_stock": 50,
+        "min_stock_level": 5, "max_stock_level": 500, "expiry_date": datetime(2030, 1, 1), "batch_number": "B-1",
+        **fields
+    }
+    return server.build_medicine_doc(MedicineCreate(**data), "tenant-1", "store-1")
+
+
+@pytest.fixture
+def stocked(database):
+    async def seed(docs):
+        await database.tenants.insert_one(dict(TENANT))
+        await database.medicines.insert_many(docs)
+    return lambda *docs: asyncio.run(seed(list(docs)))
+
+
+def names(response):
+    return [item["name"] for item in response.json()]
+
+
+def test_punctuation_only_search_is_rejected(api, stocked, make_user):
+    stocked(medicine("Amoxicillin"))
+    _, headers = make_user(UserRole.PHARMACIST)
+    response = api.get("/api/medicines", params={"search": "--- ?"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_punctuated_search_ranks_name_prefix_first(api, stocked, make_user):
+    stocked(
+        medicine("Augmentin", generic_name="Co-Amoxiclav"),
+        medicine("Co-Amoxiclav 625"),
+    )
+    _, headers = make_user(UserRole.PHARMACIST)
+    response = api.get("/api/medicines", params={"search": "co-amox"}, headers=headers)
+    assert response.status_code == 200
+    assert names(response) == ["Co-Amoxiclav 625", "Augmentin"]
+
+
+def test_accented_name_ranks_as_prefix(api, stocked, make_user):
+    stocked(medicine("Amoxil", generic_name="Éthambutol"), medicine("Éthambutol"))
+    _, headers = make_user(UserRole.PHARMACIST)
+    response = api.get("/api/medicines", params={"search": "ethamb"}, headers=headers)
+    assert names(response) == ["Éthambutol", "Amoxil"]
+
+
+def test_search_cursor_continues_the_ranked_order(api, stocked, make_user):
+    stocked(
+        medicine("Zinc Amox", generic_name="amoxicillin"),
+        medicine("Amoxicillin 250"),
+        medicine("Amoxicillin 500"),
+        medicine("Brand X", brand_name="Amoxil"),
+        medicine("Amoxil"),
+    )
+    _, headers = make_user(UserRole.PHARMACIST)
+    first = api.get("/api/medicines", params={"search": "amox", "limit": 2}, headers=headers)
+    cursor = first.headers["X-Next-Cursor"]
+    second = api.get("/api/medicines", params={"search": "amox", "limit": 2, "cursor": cursor}, headers=headers)
+    third = api.get(
+        "/api/medicines", params={"search": "amox", "limit": 2, "cursor": second.headers["X-Next-Cursor"]},
+        headers=headers
+    )
+    assert "X-Next-Cursor" not in third.headers
+    assert names(first) + names(second) + names(third) == [
+        "Amoxicillin 250", "Amoxicillin 500", "Amoxil", "Zinc Amox", "Brand X"
+    ]
+
+
+def test_created_at_cursor_is_rejected_for_search(api, stocked, make_user):
+    stocked(medicine("Amoxicillin"))
+    _, headers = make_user(UserRole.PHARMACIST)
+    cursor = server.encode_cursor({"created_at": datetime.utcnow(), "id": "x"})
+    response = api.get("/api/medicines", params={"search": "amox", "cursor": cursor}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,104 @@
+"""
+POST /sales/batch without transactions: a batch interrupted after its sales
+were recorded is finished, exactly once, by the client's retry.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from server import UserRole
+
+TENANT = {
+    "id": "tenant-1", "name": "Test Pharmacy", "subdomain": "test", "subscription_plan": "professional",
+    "subscription_status": "active", "max_stores": 3, "features_enabled": [],
+    "subscription_expires_at": datetime.utcnow() + timedelta(days=30),
+}
+
+
+@pytest.fixture
+def stocked(database):
+    async def seed():
+        await database.tenants.insert_one(dict(TENANT))
+        await database.medicines.insert_one({
+            "id": "med-1", "tenant_id": "tenant-1", "store_id": "store-1", "name": "Amoxicillin",
+            "quantity_in_stock": 100, "min_stock_level": 10,
+        })
+        await database.customers.insert_one(
+            {"id": "cust-1", "tenant_id": "tenant-1", "loyalty_points": 0, "total_spent": 0.0}
+        )
+    asyncio.run(seed())
+    return database
+
+
+def batch(*keys):
+    return {"sales": [
+        {
+            "idempotency_key": key,
+            "customer_id": "cust-1",
+            "items": [{"medicine_id": "med-1", "medicine_name": "Amoxicillin", "quantity": 2, "price": 10.0}],
+            "amount_paid": 30.0,
+            "payment_method": "cash",
+        }
+        for key in keys
+    ]}
+
+
+def state(database):
+    async def read():
+        medicine = await database.medicines.find_one({"id": "med-1"})
+        customer = await database.customers.find_one({"id": "cust-1"})
+        rollup = await database.sales_daily_rollups.find_one({"tenant_id": "tenant-1"})
+        pending = await database.sales.count_documents({"effects_pending": True})
+        return medicine["quantity_in_stock"], customer["loyalty_points"], rollup and rollup["transaction_count"], pending
+    return asyncio.run(read())
+
+
+def test_batch_applies_effects_once(api, stocked, make_user):
+    _, headers = make_user(UserRole.CASHIER)
+    response = api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch("a", "b"), headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["accepted"]) == 2
+    assert state(stocked) == (96, 42, 2, 0)
+    
+    response = api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch("a", "b"), headers=headers)
+    assert [row["idempotency_key"] for row in response.json()["duplicates"]] == ["a", "b"]
+    assert state(stocked) == (96, 42, 2, 0)
+
+
+def test_retry_finishes_an_interrupted_batch(api, stocked, make_user, monkeypatch):
+    _, headers = make_user(UserRole.CASHIER)
+    original = server.stock_adjustment_update
+    
+    def failing(delta):
+        raise RuntimeError("connection reset")
+    
+    monkeypatch.setattr(server, "stock_adjustment_update", failing)
+    with pytest.raises(RuntimeError):
+        api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch("a"), headers=headers)
+    # The sale is recorded but none of its effects landed
+    assert state(stocked) == (100, 0, None, 1)
+    
+    # While the first attempt's claim is fresh a retry leaves the sale alone
+    monkeypatch.setattr(server, "stock_adjustment_update", original)
+    response = api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch("a"), headers=headers)
+    assert [row["idempotency_key"] for row in response.json()["duplicates"]] == ["a"]
+    assert state(stocked) == (100, 0, None, 1)
+    
+    monkeypatch.setattr(server, "SALE_EFFECTS_LEASE_SECONDS", 0)
+    response = api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch("a"), headers=headers)
+    assert [row["idempotency_key"] for row in response.json()["accepted"]] == ["a"]
+    assert state(stocked) == (98, 21, 1, 0)
+    
+    response = api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch("a"), headers=headers)
+    assert [row["idempotency_key"] for row in response.json()["duplicates"]] == ["a"]
+    assert state(stocked) == (98, 21, 1, 0)
+
+
+def test_batch_size_is_capped(api, stocked, make_user):
+    _, headers = make_user(UserRole.CASHIER)
+    keys = [f"key-{index}" for index in range(server.SALE_BATCH_MAX_SIZE + 1)]
+    response = api.post("/api/sales/batch", params={"store_id": "store-1"}, json=batch(*keys), headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,97 @@
+"""
+Role hierarchy for PUT /users/{id}, POST /users/{id}/deactivate and
+POST /auth/register: nobody manages or grants a role at or above their own.
+"""
+
+import asyncio
+
+import pytest
+
+from server import UserRole
+
+
+def stored_user(database, user_id):
+    return asyncio.run(database.users.find_one({"id": user_id}))
+
+
+def test_manager_cannot_promote_self_to_super_admin(api, database, make_user):
+    manager, headers = make_user(UserRole.PHARMACY_MANAGER)
+    response = api.put(f"/api/users/{manager['id']}", json={"role": "super_admin"}, headers=headers)
+    assert response.status_code == 403
+    assert stored_user(database, manager["id"])["role"] == UserRole.PHARMACY_MANAGER
+
+
+@pytest.mark.parametrize("role", ["pharmacy_manager", "pharmacy_owner", "super_admin"])
+def test_manager_cannot_grant_own_rank_or_above(api, database, make_user, role):
+    _, headers = make_user(UserRole.PHARMACY_MANAGER)
+    pharmacist, _ = make_user(UserRole.PHARMACIST)
+    response = api.put(f"/api/users/{pharmacist['id']}", json={"role": role}, headers=headers)
+    assert response.status_code == 403
+    assert stored_user(database, pharmacist["id"])["role"] == UserRole.PHARMACIST
+
+
+def test_manager_cannot_deactivate_owner(api, database, make_user):
+    _, headers = make_user(UserRole.PHARMACY_MANAGER)
+    owner, _ = make_user(UserRole.PHARMACY_OWNER)
+    response = api.post(f"/api/users/{owner['id']}/deactivate", headers=headers)
+    assert response.status_code == 403
+    assert stored_user(database, owner["id"])["is_active"] is True
+
+
+def test_manager_cannot_edit_another_manager(api, make_user):
+    _, headers = make_user(UserRole.PHARMACY_MANAGER)
+    other, _ = make_user(UserRole.PHARMACY_MANAGER)
+    response = api.put(f"/api/users/{other['id']}", json={"phone": "555-0199"}, headers=headers)
+    assert response.status_code == 403
+
+
+def test_manager_cannot_deactivate_self(api, make_user):
+    manager, headers = make_user(UserRole.PHARMACY_MANAGER)
+    response = api.post(f"/api/users/{manager['id']}/deactivate", headers=headers)
+    assert response.status_code == 403
+
+
+def test_manager_manages_lower_ranks(api, database, make_user):
+    _, headers = make_user(UserRole.PHARMACY_MANAGER)
+    pharmacist, _ = make_user(UserRole.PHARMACIST)
+    response = api.put(f"/api/users/{pharmacist['id']}", json={"role": "cashier"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["role"] == "cashier"
+    response = api.post(f"/api/users/{pharmacist['id']}/deactivate", headers=headers)
+    assert response.status_code == 200
+    assert stored_user(database, pharmacist["id"])["is_active"] is False
+
+
+def test_owner_can_promote_to_manager(api, make_user):
+    _, headers = make_user(UserRole.PHARMACY_OWNER)
+    pharmacist, _ = make_user(UserRole.PHARMACIST)
+    response = api.put(f"/api/users/{pharmacist['id']}", json={"role": "pharmacy_manager"}, headers=headers)
+    assert response.status_code == 200
+
+
+def test_only_super_admin_grants_super_admin(api, make_user):
+    _, owner_headers = make_user(UserRole.PHARMACY_OWNER)
+    _, admin_headers = make_user(UserRole.SUPER_ADMIN, tenant_id=None)
+    manager, _ = make_user(UserRole.PHARMACY_MANAGER)
+    assert api.put(f"/api/users/{manager['id']}", json={"role": "super_admin"}, headers=owner_headers).status_code == 403
+    assert api.put(f"/api/users/{manager['id']}", json={"role": "super_admin"}, headers=admin_headers).status_code == 200
+
+
+def test_users_of_other_tenants_are_not_found(api, make_user):
+    _, headers = make_user(UserRole.PHARMACY_OWNER)
+    outsider, _ = make_user(UserRole.CASHIER, tenant_id="tenant-2")
+    response = api.post(f"/api/users/{outsider['id']}/deactivate", headers=headers)
+    assert response.status_code == 404
+
+
+def test_register_cannot_create_higher_roles(api, make_user):
+    _, headers = make_user(UserRole.PHARMACY_MANAGER)
+    payload = {"email": "new@example.com", "password": "secret-password", "name": "New", "role": "pharmacy_owner"}
+    assert api.post("/api/auth/register", json=payload, headers=headers).status_code == 403
+
+
+def test_deactivated_user_is_rejected(api, make_user):
+    _, headers = make_user(UserRole.PHARMACY_OWNER)
+    cashier, cashier_headers = make_user(UserRole.CASHIER)
+    assert api.post(f"/api/users/{cashier['id']}/deactivate", headers=headers).status_code == 200
+    assert api.get("/api/notifications/unread-count", headers=cashier_headers).status_code == 401